@@ -0,0 +1,66 @@
+"""Benchmark the overhead of dispatching a run to a management command.
+
+A command doing nothing is executed, first resolving it by name with
+`call_command`, as each run did, and then with an instance of its class,
+cached by `taskmanager.execution.get_command_class`.
+The help text of the command is built each time, and then cached.
+
+Usage:
+
+    PYTHONPATH=.:demo python benchmarks/bench_command_dispatch.py [n_runs]
+"""
+
+import os
+import sys
+import time
+from io import StringIO
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+django.setup()
+
+from django.core.management import call_command, load_command_class  # noqa: E402
+
+from taskmanager.execution import get_command_class, get_command_help  # noqa: E402
+
+APP_NAME = "taskmanager"
+NAME = "test_command"
+ARGS = ("arg1", "arg2", "-a")
+
+
+def main():
+    """Run the benchmark."""
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    t = time.perf_counter()
+    for _ in range(n_runs):
+        call_command(NAME, *ARGS, stdout=StringIO())
+    by_name = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for _ in range(n_runs):
+        call_command(get_command_class(APP_NAME, NAME)(), *ARGS, stdout=StringIO())
+    cached = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for _ in range(n_runs):
+        output = StringIO()
+        command = load_command_class(APP_NAME, NAME)
+        command.create_parser("", NAME).print_help(file=output)
+    help_built = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for _ in range(n_runs):
+        get_command_help(APP_NAME, NAME)
+    help_cached = time.perf_counter() - t
+
+    print(f"{n_runs} runs of {NAME}")
+    print(f"by name:       {by_name / n_runs * 1e6:8.1f} us/run")
+    print(f"cached class:  {cached / n_runs * 1e6:8.1f} us/run")
+    print(f"help built:    {help_built / n_runs * 1e6:8.1f} us/call")
+    print(f"help cached:   {help_cached / n_runs * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the computation of the next fire time of cron schedules.
+
+The next fire time is found with `CronSchedule.next_fire`, jumping through
+the bitsets of the compiled expression, and by iterating minute by minute
+until `CronSchedule.matches`, for comparison.
+
+Usage:
+
+    PYTHONPATH=. python benchmarks/bench_cron.py [n_iterations]
+"""
+
+import datetime
+import sys
+import time
+
+from taskmanager.cron import UTC, CronSchedule, get_cron_schedule
+
+EXPRESSIONS = [
+    "*/5 * * * *",
+    "*/15 8-20 * * mon-fri",
+    "30 2 * * sun",
+    "0 0 1 */3 *",
+    "0 0 29 feb *",
+]
+
+
+def next_fire_by_minute(schedule, after):
+    """Return the next fire time, iterating minute by minute."""
+    fire = after.replace(second=0, microsecond=0)
+    while True:
+        fire += datetime.timedelta(minutes=1)
+        if schedule.matches(fire):
+            return fire
+
+
+def main():
+    """Run the benchmark."""
+    n_iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    after = datetime.datetime(2022, 3, 1, 12, 7, tzinfo=UTC)
+    t = time.perf_counter()
+    for _ in range(n_iterations):
+        get_cron_schedule.cache_clear()
+        get_cron_schedule(EXPRESSIONS[1])
+    print(f"compile: {(time.perf_counter() - t) / n_iterations * 1e6:10.1f} µs")
+    for expression in EXPRESSIONS:
+        schedule = CronSchedule(expression)
+        t = time.perf_counter()
+        for _ in range(n_iterations):
+            fire = schedule.next_fire(after)
+        bitsets_time = (time.perf_counter() - t) / n_iterations
+        n_minute_iterations = max(1, n_iterations // 1000)
+        t = time.perf_counter()
+        for _ in range(n_minute_iterations):
+            assert next_fire_by_minute(schedule, after) == fire
+        by_minute_time = (time.perf_counter() - t) / n_minute_iterations
+        print(
+            f"{expression:>22}: next fire {fire:%Y-%m-%d %H:%M}, "
+            f"bitsets {bitsets_time * 1e6:8.1f} µs, "
+            f"minute by minute {by_minute_time * 1e6:12.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
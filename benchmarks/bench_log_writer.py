@@ -0,0 +1,74 @@
+"""Benchmark the throughput of report log writers, line-flushed or buffered.
+
+A chatty command, `test_livelogging_command` without sleeping between
+iterations, is called with its output written to a plain line-buffered
+file, as a baseline, and then by `ReportLogWriter`, first flushing every
+line and then buffering the output and flushing it periodically from a
+background thread.
+
+Usage:
+
+    PYTHONPATH=.:demo python benchmarks/bench_log_writer.py [n_lines]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from taskmanager.logfile import ReportLogWriter, remove_logfile  # noqa: E402
+
+
+COMMAND = "test_livelogging_command"
+
+
+def measure(label, n_lines, open_writer=ReportLogWriter, **writer_options):
+    """Print the throughput of the writer, in lines per second."""
+    fd, path = tempfile.mkstemp(suffix=".log")
+    os.close(fd)
+    try:
+        t = time.perf_counter()
+        with open_writer(path, **writer_options) as writer:
+            call_command(
+                COMMAND,
+                f"--limit={n_lines}",
+                "--sleep=0",
+                "--verbosity=3",
+                stdout=writer,
+            )
+        elapsed = time.perf_counter() - t
+        with open(path, "rb") as f:
+            n_written = sum(1 for _ in f)
+        print(
+            f"{label:>29}: {n_written} lines in {elapsed:6.2f} s, "
+            f"{n_written / elapsed:10.0f} lines/s"
+        )
+    finally:
+        remove_logfile(path)
+
+
+def main():
+    """Run the benchmark."""
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    # log to the report logfile only, not to the console of the project
+    logging.getLogger(f"taskmanager.management.commands.{COMMAND}").propagate = False
+    measure("plain file, line-buffered", n_lines, open, mode="w", buffering=1)
+    measure("flushed every line", n_lines)
+    measure(
+        "buffered, flushed every 250ms",
+        n_lines,
+        flush_interval=0.25,
+        buffer_size=64 * 1024,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark disk usage and read latency of compressed report logfiles.
+
+A realistic log is written with `ReportLogWriter`, then read through
+`LogReader`, first as a plain logfile and then once compressed.
+
+Usage:
+
+    PYTHONPATH=. python benchmarks/bench_logfile_compression.py [n_lines]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from taskmanager.logfile import (
+    LogReader,
+    ReportLogWriter,
+    blocks_path,
+    compress_logfile,
+    compressed_path,
+    index_path,
+    remove_logfile,
+)
+
+LEVELS = ["DEBUG"] * 70 + ["INFO"] * 20 + ["WARNING"] * 8 + ["ERROR"] * 2
+MESSAGES = [
+    "Processing item {n} of the import from https://example.com/api/items/{n}/",
+    "Item {n} updated: 3 fields changed, 0 relations added",
+    "Cache miss for key import:item:{n}, fetching",
+    "Item {n} skipped: missing required field 'code'",
+    "Could not reach https://example.com/api/items/{n}/: timeout after 30s",
+]
+
+
+def write_log(path, n_lines):
+    """Write a log of `n_lines` lines, as a chatty import command would."""
+    random.seed(0)
+    with ReportLogWriter(path) as writer:
+        for n in range(n_lines):
+            writer.write(
+                f"[17/Oct/2022 10:{n // 60 % 60:02d}:{n % 60:02d}] "
+                f"{random.choice(LEVELS)} {random.choice(MESSAGES).format(n=n)}\n"
+            )
+
+
+def measure(label, reader, n_lines, n_reads=200):
+    """Print the latency of tail, random page and full reads."""
+    random.seed(1)
+    t = time.perf_counter()
+    for _ in range(n_reads):
+        reader.tail(100)
+    tail_time = (time.perf_counter() - t) / n_reads
+    t = time.perf_counter()
+    for _ in range(n_reads):
+        reader.lines(random.randrange(n_lines), 100)
+    page_time = (time.perf_counter() - t) / n_reads
+    t = time.perf_counter()
+    for _ in reader.iter_lines():
+        pass
+    full_time = time.perf_counter() - t
+    print(
+        f"{label:>10}: tail(100) {tail_time * 1000:8.3f} ms, "
+        f"random page of 100 lines {page_time * 1000:8.3f} ms, "
+        f"full scan {full_time:6.2f} s"
+    )
+
+
+def main():
+    """Run the benchmark."""
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    fd, path = tempfile.mkstemp(suffix=".log")
+    os.close(fd)
+    try:
+        write_log(path, n_lines)
+        plain_size = os.path.getsize(path)
+        reader = LogReader(path)
+        measure("plain", reader, n_lines)
+
+        t = time.perf_counter()
+        compress_logfile(path)
+        compress_time = time.perf_counter() - t
+        compressed_size = os.path.getsize(compressed_path(path)) + os.path.getsize(
+            blocks_path(path)
+        )
+        measure("compressed", reader, n_lines)
+
+        print(
+            f"{n_lines} lines, index {os.path.getsize(index_path(path)) / 2**20:.1f} MiB"
+            f"\nplain {plain_size / 2**20:.1f} MiB, compressed "
+            f"{compressed_size / 2**20:.1f} MiB "
+            f"({compressed_size / plain_size:.1%}), compressed in {compress_time:.2f} s"
+        )
+    finally:
+        remove_logfile(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark the computation of the next rides of many tasks.
+
+Tasks repeated every few minutes, with a report each, are created in a test
+database; then their cached next ride is recomputed, first one task at a
+time, and then in bulk with `TaskQuerySet.update_next_rides`.
+
+Usage:
+
+    PYTHONPATH=.:demo python benchmarks/bench_next_rides.py [n_tasks]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from taskmanager.models import AppCommand, Report, Task  # noqa: E402
+
+
+def create_tasks(n_tasks):
+    """Create spooled tasks, each one with a report."""
+    command = AppCommand.objects.create(name="check", app_name="django.core")
+    now = timezone.now()
+    Task.objects.bulk_create(
+        Task(
+            name=f"task {n}",
+            command=command,
+            status=Task.STATUS_SPOOLED,
+            scheduling=now,
+            repetition_period=Task.REPETITION_PERIOD_MINUTE,
+            repetition_rate=n % 30 + 1,
+        )
+        for n in range(n_tasks)
+    )
+    Report.objects.bulk_create(
+        Report(task_id=task_id, invocation_result=Report.RESULT_OK)
+        for task_id in Task.objects.values_list("id", flat=True)
+    )
+    Report.objects.update(invocation_datetime=now - datetime.timedelta(minutes=1))
+
+
+def measure(label, recompute):
+    """Print the number of queries and the wall time of a recomputation."""
+    Task.objects.update(cached_next_ride=None)
+    n_queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal n_queries
+        n_queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_queries):
+        t = time.perf_counter()
+        recompute()
+        elapsed = time.perf_counter() - t
+    print(f"{label:>12}: {n_queries:7d} queries, {elapsed:7.2f} s")
+
+
+def recompute_one_by_one():
+    """Recompute and save the next ride of each task, as `Task.stop` does."""
+    for task in Task.objects.all():
+        task.cached_next_ride = task.get_next_ride()
+        task.save(update_fields=("cached_next_ride",))
+
+
+def main():
+    """Run the benchmark."""
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        create_tasks(n_tasks)
+        print(f"{n_tasks} tasks")
+        measure("one by one", recompute_one_by_one)
+        measure("bulk", lambda: Task.objects.all().update_next_rides())
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
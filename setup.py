@@ -42,7 +42,6 @@ setup(
     install_requires=[
         "django>=1.11",
         "uwsgi",
-        "file-read-backwards>=2.0.0",
     ],
     extras_require={
         "notifications": ["slack_sdk"],
@@ -71,14 +71,30 @@ class ReportAdmin(ReportMixin, admin.ModelAdmin):
     date_hierarchy = "invocation_datetime"
     fields = readonly_fields = (
         "task",
+        "parent",
+        "shard_value",
         "invocation_result",
         "invocation_datetime",
         "log_tail",
         "n_log_errors",
         "n_log_warnings",
+        "exit_status",
+        "duration",
+        "cpu_user",
+        "cpu_system",
+        "max_rss",
+        "io_read_blocks",
+        "io_write_blocks",
         "logfile",
     )
-    list_display = ("task", "invocation_result", "invocation_datetime")
+    list_display = (
+        "task",
+        "invocation_result",
+        "invocation_datetime",
+        "duration",
+        "cpu_user",
+        "max_rss",
+    )
     list_filter = ("invocation_result",)
     ordering = ("-invocation_datetime", "-id")
     search_field = ("task__name", "task__status", "task__spooler_id")
@@ -165,8 +181,8 @@ class AppCommandAdmin(admin.ModelAdmin):
     """Admin options for application commands."""
 
     change_form_template = "admin/appcommand_changeform.html"
-    list_display = ("app_name", "name", "active")
-    list_editable = ("active",)
+    list_display = ("app_name", "name", "active", "max_concurrency")
+    list_editable = ("active", "max_concurrency")
     list_filter = ("active",)
     ordering = ("app_name", "name")
     readonly_fields = ("app_name", "name")
@@ -261,7 +277,7 @@ class TaskCategoryAdmin(admin.ModelAdmin):
     """Admin options for task categories."""
 
     inlines = [TaskInline]
-    list_display = ("name",)
+    list_display = ("name", "jitter", "max_concurrency", "lane")
 
 
 @admin.register(Task)
@@ -282,6 +298,7 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         "invocation",
         "status",
         "cached_last_invocation_datetime",
+        "cached_last_invocation_duration",
         "cached_next_ride",
         "repetition",
     )
@@ -291,11 +308,32 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
     fieldsets = (
         (
             "Definition",
-            {"fields": ("name", "command", "arguments", "category", "note")},
+            {
+                "fields": (
+                    "name",
+                    "command",
+                    "arguments",
+                    "shard_argument",
+                    "shard_values",
+                    "category",
+                    "lane",
+                    "note",
+                )
+            },
         ),
         (
             "Scheduling",
-            {"fields": ("scheduling", "repetition_period", "repetition_rate")},
+            {
+                "fields": (
+                    "scheduling",
+                    "repetition_period",
+                    "repetition_rate",
+                    "cron_expression",
+                    "jitter",
+                    "overlap_policy",
+                    "timeout",
+                )
+            },
         ),
         (
             "Last execution",
@@ -305,9 +343,12 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
                     "status",
                     "cached_last_invocation_datetime",
                     "cached_last_invocation_result",
+                    "cached_last_invocation_duration",
                     "cached_next_ride",
+                    "jitter_offset",
                     "cached_last_invocation_n_errors",
                     "cached_last_invocation_n_warnings",
+                    "n_skipped_runs",
                 )
             },
         ),
@@ -317,9 +358,12 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         "status",
         "cached_last_invocation_result",
         "cached_last_invocation_datetime",
+        "cached_last_invocation_duration",
         "cached_next_ride",
+        "jitter_offset",
         "cached_last_invocation_n_errors",
         "cached_last_invocation_n_warnings",
+        "n_skipped_runs",
     )
     save_as = True
     save_on_top = True
@@ -349,6 +393,9 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
                         "arguments",
                         "repetition_period",
                         "repetition_rate",
+                        "cron_expression",
+                        "jitter",
+                        "lane",
                     ]
                 )
             )
@@ -380,35 +427,37 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
 
     def stop_tasks(self, request, queryset):
         """Remove selected tasks, stop tasks if scheduled, before removing them."""
-        for obj in queryset:
-            obj.stop()
+        n_stopped = queryset.stop()
         self.message_user(
-            request,
-            f"{len(queryset)} tasks successfully stopped",
-            level=messages.SUCCESS,
+            request, f"{n_stopped} tasks successfully stopped", level=messages.SUCCESS,
         )
 
     stop_tasks.short_description = _("Stop selected tasks")
 
     def launch_tasks(self, request, queryset):
         """Launch selected tasks."""
-        for obj in queryset:
-            obj.launch()
-        self.message_user(
-            request, f"{len(queryset)} tasks launched", level=messages.SUCCESS
-        )
+        n_launched = queryset.launch()
+        self.message_user(request, f"{n_launched} tasks launched", level=messages.SUCCESS)
 
     launch_tasks.short_description = _("Start selected tasks")
 
     def repetition(self, obj):
         """Return the string representation of the repetition."""
-        if obj.repetition_rate and obj.repetition_period:
+        if obj.cron_expression:
+            return obj.cron_expression
+        elif obj.repetition_rate and obj.repetition_period:
             return f"{obj.repetition_rate} {obj.repetition_period}"
         else:
             return "-"
 
     repetition.short_description = _("Repetition rate")
 
+    def jitter_offset(self, obj):
+        """Return the delay added by jitter to the next rides."""
+        return f"+{int(obj.get_jitter_offset().total_seconds())}s"
+
+    jitter_offset.short_description = _("Jitter delay")
+
     def name_desc(self, obj):
         return format_html(
             f"<span title=\"{obj.note}\">{obj.name}</span>"
@@ -440,6 +489,9 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         elif result == 'FAILED':
             bgcolor = 'red'
             result_str = _("FAILED")
+        elif result == 'TIMEOUT':
+            bgcolor = 'red'
+            result_str = _("TIMEOUT")
 
         s = format_html(
             f"<b style=\"border-left:10px solid {bgcolor}; padding-left: 5px;\">{result_str}</b>"
@@ -461,6 +513,18 @@ class TaskAdmin(BulkDeleteMixin, admin.ModelAdmin):
         else:
             return "-"
 
+    def cached_last_invocation_duration(self, obj):
+        """Return the string representation of the last duration."""
+        if obj.cached_last_invocation_duration is not None:
+            return f"{obj.cached_last_invocation_duration:.1f}s"
+        else:
+            return "-"
+
+    cached_last_invocation_duration.short_description = _("Last duration")
+    cached_last_invocation_duration.admin_order_field = (
+        "cached_last_invocation_duration"
+    )
+
     class Media:
         """Task Admin asset definitions."""
 
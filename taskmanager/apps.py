@@ -9,7 +9,12 @@ except ImportError:
     from django.utils.translation import gettext_lazy as _
 
 from taskmanager.notifications import NotificationHandler
-from taskmanager.settings import UWSGI_TASKMANAGER_NOTIFICATION_HANDLERS
+from taskmanager.settings import (
+    UWSGI_TASKMANAGER_DISPATCHER,
+    UWSGI_TASKMANAGER_DISPATCHER_MULE,
+    UWSGI_TASKMANAGER_NOTIFICATION_HANDLERS,
+    UWSGI_TASKMANAGER_PRELOAD_COMMANDS,
+)
 
 
 class TaskmanagerConfig(AppConfig):
@@ -31,3 +36,11 @@ class TaskmanagerConfig(AppConfig):
     def ready(self) -> None:
         """Run stuff when Django starts."""
         self._register_notification_handlers()
+        if UWSGI_TASKMANAGER_DISPATCHER and UWSGI_TASKMANAGER_DISPATCHER_MULE:
+            from taskmanager.dispatcher import register_dispatcher_mule
+
+            register_dispatcher_mule(UWSGI_TASKMANAGER_DISPATCHER_MULE)
+        if UWSGI_TASKMANAGER_PRELOAD_COMMANDS:
+            from taskmanager.execution import register_spooler_preloading
+
+            register_spooler_preloading()
@@ -0,0 +1,202 @@
+"""Define cron expression schedules for the taskmanager app.
+
+A cron expression has five fields, separated by spaces:
+minute (0-59), hour (0-23), day of month (1-31), month (1-12 or jan-dec)
+and day of week (0-7 or sun-sat, where both 0 and 7 are sunday).
+
+Each field is a comma separated list of `*`, values and ranges (`a-b`),
+optionally followed by a step (`*/15`, `8-20/2`); the `@yearly`,
+`@annually`, `@monthly`, `@weekly`, `@daily` and `@hourly` macros are
+accepted too. As in cron, when both the day of month and the day of week
+are restricted, a day matching either one of them matches.
+
+Expressions are compiled once into a `CronSchedule`, holding a bitset for
+each field, so that the next fire time is found jumping from a set bit to
+the next one, field by field, instead of iterating minute by minute.
+"""
+
+import calendar
+import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+MONTH_NAMES = {
+    name.lower(): n for n, name in enumerate(calendar.month_abbr) if name
+}
+DAY_NAMES = {
+    name: n for n, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))
+}
+# (min value, max value, names) of each field
+FIELDS: Tuple[Tuple[int, int, Dict[str, int]], ...] = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, MONTH_NAMES),
+    (0, 7, DAY_NAMES),
+)
+UTC = datetime.timezone.utc
+# the longest span between two fire times: leap days, skipping a century year
+MAX_YEARS = 8
+
+
+def _parse_value(value: str, names: Dict[str, int]) -> int:
+    value = value.lower()
+    if value in names:
+        return names[value]
+    if not value.isdigit():
+        raise ValueError(f"invalid value {value!r}")
+    return int(value)
+
+
+def _parse_field(
+    field: str, min_value: int, max_value: int, names: Dict[str, int]
+) -> Tuple[int, bool]:
+    """Return the bitset of a field, and whether it is restricted (not `*`)."""
+    bits = 0
+    for item in field.split(","):
+        range_item, _, step_item = item.partition("/")
+        step = int(step_item) if step_item else 1
+        if step < 1:
+            raise ValueError(f"invalid step in {field!r}")
+        if range_item == "*":
+            start, end = min_value, max_value
+        else:
+            start_item, _, end_item = range_item.partition("-")
+            start = _parse_value(start_item, names)
+            if end_item:
+                end = _parse_value(end_item, names)
+            else:
+                end = max_value if step > 1 else start
+        if not min_value <= start <= end <= max_value:
+            raise ValueError(f"{field!r} out of range {min_value}-{max_value}")
+        for value in range(start, end + 1, step):
+            bits |= 1 << value
+    return bits, not field.startswith("*")
+
+
+def _next_bit(bits: int, n: int) -> Optional[int]:
+    """Return the lowest set bit of `bits` not lower than `n`, if any."""
+    bits >>= n
+    if not bits:
+        return None
+    return n + (bits & -bits).bit_length() - 1
+
+
+class CronSchedule(object):
+    """A compiled cron expression."""
+
+    def __init__(self, expression: str):
+        """Parse the expression, raising ValueError if not valid."""
+        self.expression = expression
+        fields = MACROS.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"{expression!r} has not 5 fields")
+        parsed = [_parse_field(f, *FIELDS[n]) for n, f in enumerate(fields)]
+        (self.minutes, _), (self.hours, _), (self.days, dom_restricted) = parsed[:3]
+        (self.months, _), (days_of_week, dow_restricted) = parsed[3:]
+        # sunday is both 0 and 7
+        if days_of_week & 1 << 7:
+            days_of_week = (days_of_week | 1) & ~(1 << 7)
+        self.days_of_week = days_of_week
+        # NOTE: as in cron, restricted days of month and of week are alternative
+        self.days_or_days_of_week = dom_restricted and dow_restricted
+        if not dom_restricted and dow_restricted:
+            self.days = 0
+        elif dom_restricted and not dow_restricted:
+            self.days_of_week = 0
+        self._month_days: Dict[Tuple[int, int], int] = {}
+
+    def __repr__(self):
+        """Return the representation of the schedule."""
+        return f"CronSchedule({self.expression!r})"
+
+    def month_days(self, year: int, month: int) -> int:
+        """Return the bitset of the days of a month matching the schedule."""
+        key = (year, month)
+        if key not in self._month_days:
+            first_weekday, n_days = calendar.monthrange(year, month)
+            # calendar weekdays start from monday, cron ones from sunday
+            first_weekday = (first_weekday + 1) % 7
+            bits = self.days & ((1 << n_days + 1) - 2)
+            for weekday in range(7):
+                if self.days_of_week & 1 << weekday:
+                    for day in range(1 + (weekday - first_weekday) % 7, n_days + 1, 7):
+                        bits |= 1 << day
+            if len(self._month_days) > 1024:
+                self._month_days.clear()
+            self._month_days[key] = bits
+        return self._month_days[key]
+
+    def matches(self, dt: datetime.datetime) -> bool:
+        """Return True if the schedule fires in the minute of `dt`."""
+        return bool(
+            self.minutes & 1 << dt.minute
+            and self.hours & 1 << dt.hour
+            and self.months & 1 << dt.month
+            and self.month_days(dt.year, dt.month) & 1 << dt.day
+        )
+
+    def next_local_fire(self, after: datetime.datetime) -> datetime.datetime:
+        """Return the first naive datetime matching the schedule, after `after`."""
+        year, month, day = after.year, after.month, after.day
+        hour, minute = after.hour, after.minute + 1
+        while year <= after.year + MAX_YEARS:
+            next_month = _next_bit(self.months, month)
+            if next_month is None:
+                year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+                continue
+            if next_month != month:
+                month, day, hour, minute = next_month, 1, 0, 0
+            next_day = _next_bit(self.month_days(year, month), day)
+            if next_day is None:
+                month, day, hour, minute = month + 1, 1, 0, 0
+                continue
+            if next_day != day:
+                day, hour, minute = next_day, 0, 0
+            next_hour = _next_bit(self.hours, hour)
+            if next_hour is None:
+                day, hour, minute = day + 1, 0, 0
+                continue
+            if next_hour != hour:
+                hour, minute = next_hour, 0
+            next_minute = _next_bit(self.minutes, minute)
+            if next_minute is None:
+                hour, minute = hour + 1, 0
+                continue
+            return datetime.datetime(year, month, day, hour, next_minute)
+        raise ValueError(f"{self.expression!r} never fires")
+
+    def next_fire(
+        self, after: datetime.datetime, tz: datetime.tzinfo = UTC
+    ) -> datetime.datetime:
+        """Return the first time the schedule fires after `after`, in UTC.
+
+        The schedule is evaluated in the time zone `tz`.
+        """
+        local = after.astimezone(tz).replace(tzinfo=None, second=0, microsecond=0)
+        while True:
+            local = self.next_local_fire(local)
+            if hasattr(tz, "localize"):
+                # NOTE: pytz time zones
+                fire = tz.localize(local)
+            else:
+                fire = local.replace(tzinfo=tz)
+            fire = fire.astimezone(UTC)
+            # NOTE: local times repeated when clocks go back fire once
+            if fire > after:
+                return fire
+
+
+@lru_cache(maxsize=1024)
+def get_cron_schedule(expression: str) -> CronSchedule:
+    """Return the compiled schedule of a cron expression."""
+    return CronSchedule(expression)
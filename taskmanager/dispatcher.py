@@ -0,0 +1,194 @@
+"""Define the dispatcher of scheduled tasks for the taskmanager app.
+
+By default, a scheduled task is spooled as soon as it is launched, with the
+time of its next ride as the `at` parameter, so that the uWSGI spooler scans
+a file for each scheduled task at each iteration.
+
+When `UWSGI_TASKMANAGER_DISPATCHER` is set, scheduled tasks are not spooled
+until due: the dispatcher keeps the next rides of the tasks in a min-heap,
+loaded from the DB at startup, and spools the tasks as they become due.
+Tasks launched or re-scheduled are notified to the dispatcher, when running
+in the uWSGI mule number `UWSGI_TASKMANAGER_DISPATCHER_MULE`; anyway the heap
+is loaded from the DB again every `UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL`
+seconds, that is how the dispatcher learns about changes when running with
+the `run_dispatcher` management command.
+
+Entries of the heap are never removed when a task is stopped or re-scheduled:
+they are checked against the DB when due, and skipped if stale.
+"""
+
+import heapq
+import logging
+import math
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from taskmanager.settings import (
+    UWSGI_TASKMANAGER_DISPATCHER,
+    UWSGI_TASKMANAGER_DISPATCHER_MULE,
+    UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL,
+)
+from taskmanager.uwsgidecorators_wrapper import mule
+
+try:
+    import uwsgi
+except ImportError:
+    # NOTE: running outside of uWSGI
+    uwsgi = None
+
+logger = logging.getLogger(__name__)
+
+
+def notify_dispatcher(task_ids: Iterable[int]) -> None:
+    """Notify the dispatcher mule that tasks have been launched or re-scheduled."""
+    if not (UWSGI_TASKMANAGER_DISPATCHER and UWSGI_TASKMANAGER_DISPATCHER_MULE):
+        return
+    if uwsgi is None or not hasattr(uwsgi, "mule_msg"):
+        # NOTE: the dispatcher will learn about them when re-synced
+        return
+    message = ",".join(str(task_id) for task_id in task_ids).encode()
+    if message:
+        transaction.on_commit(
+            lambda: uwsgi.mule_msg(message, UWSGI_TASKMANAGER_DISPATCHER_MULE)
+        )
+
+
+class Dispatcher(object):
+    """A min-heap of the next rides of tasks, spooling them when due."""
+
+    def __init__(
+        self, resync_interval: float = UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL
+    ):
+        """Set up an empty heap."""
+        self.heap: List[Tuple[float, int]] = []
+        self.resync_interval = resync_interval
+        self.next_resync = 0.0
+
+    @staticmethod
+    def get_waiting_tasks():
+        """Return the tasks waiting for the dispatcher to spool them."""
+        from taskmanager.models import Task
+
+        return Task.objects.filter(
+            status__in=(Task.STATUS_SCHEDULED, Task.STATUS_SPOOLED),
+            spooler_id="",
+            cached_next_ride__isnull=False,
+        )
+
+    def load(self) -> None:
+        """Load the heap with the next rides of the waiting tasks."""
+        self.heap = [
+            (next_ride.timestamp(), task_id)
+            for task_id, next_ride in self.get_waiting_tasks().values_list(
+                "id", "cached_next_ride"
+            )
+        ]
+        heapq.heapify(self.heap)
+        self.next_resync = time.time() + self.resync_interval
+        logger.debug(f"{len(self.heap)} tasks loaded in the dispatcher")
+
+    def update(self, task_ids: Iterable[int]) -> None:
+        """Push the next rides of the given tasks, if waiting."""
+        for task_id, next_ride in self.get_waiting_tasks().filter(
+            id__in=list(task_ids)
+        ).values_list("id", "cached_next_ride"):
+            heapq.heappush(self.heap, (next_ride.timestamp(), task_id))
+
+    def pop_due(self, now: float) -> List[Tuple[float, int]]:
+        """Pop the entries of the heap due at `now`."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+        return due
+
+    def dispatch_due(self, now: Optional[float] = None) -> int:
+        """Spool the tasks due at `now`, skipping stale entries.
+
+        :return: the number of tasks spooled
+        """
+        due = self.pop_due(time.time() if now is None else now)
+        if not due:
+            return 0
+        tasks = (
+            self.get_waiting_tasks()
+            .select_related("command", "category")
+            .in_bulk([task_id for _, task_id in due])
+        )
+        n_dispatched = 0
+        for next_ride, task_id in due:
+            task = tasks.pop(task_id, None)
+            # NOTE: stopped, re-scheduled or already dispatched
+            if task is None or task.cached_next_ride.timestamp() != next_ride:
+                continue
+            if self.dispatch(task):
+                n_dispatched += 1
+        return n_dispatched
+
+    def dispatch(self, task) -> bool:
+        """Spool a task, if not spooled meanwhile.
+
+        :return: True if the task has been spooled
+        """
+        from taskmanager.models import Task
+        from taskmanager.tasks import spool_task
+
+        claimed = Task.objects.filter(
+            pk=task.pk,
+            status=task.status,
+            spooler_id="",
+            cached_next_ride=task.cached_next_ride,
+        ).update(status=Task.STATUS_SPOOLED)
+        if not claimed:
+            return False
+        task.status = Task.STATUS_SPOOLED
+        spooler_id = spool_task(task)
+        if spooler_id:
+            Task.objects.filter(pk=task.pk, status=Task.STATUS_SPOOLED).update(
+                spooler_id=spooler_id
+            )
+        logger.debug(f"Task {task.pk} dispatched")
+        return True
+
+    def wait(self, timeout: float) -> List[int]:
+        """Wait for notifications up to `timeout` seconds.
+
+        :return: the ids of the tasks notified
+        """
+        if uwsgi is None or not hasattr(uwsgi, "mule_get_msg"):
+            time.sleep(timeout)
+            return []
+        message = uwsgi.mule_get_msg(timeout=max(1, math.ceil(timeout)))
+        task_ids = []
+        for task_id in (message or b"").split(b","):
+            try:
+                task_ids.append(int(task_id))
+            except ValueError:
+                pass
+        return task_ids
+
+    def run(self, max_timeout: float = 60) -> None:
+        """Spool tasks as they become due, forever."""
+        self.load()
+        while True:
+            now = time.time()
+            self.dispatch_due(now)
+            if now >= self.next_resync:
+                self.load()
+            timeout = min(self.next_resync, now + max_timeout)
+            if self.heap:
+                timeout = min(timeout, self.heap[0][0])
+            task_ids = self.wait(max(0.0, timeout - time.time()))
+            if task_ids:
+                self.update(task_ids)
+
+
+def run_dispatcher() -> None:
+    """Run the dispatcher."""
+    Dispatcher().run()
+
+
+def register_dispatcher_mule(num: int) -> None:
+    """Run the dispatcher in the uWSGI mule number `num`."""
+    mule(num)(run_dispatcher)
@@ -0,0 +1,354 @@
+"""Execute the commands of tasks, caching their classes in each process.
+
+Commands can be executed in forked child processes, with resource limits,
+and are interrupted when running out of time.
+"""
+
+import codecs
+import ctypes
+import os
+import select
+import signal
+import sys
+import threading
+import time
+from functools import lru_cache
+from io import StringIO, TextIOBase
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Type, Union
+
+from django import db
+from django.core.management import BaseCommand, call_command, load_command_class
+
+EXECUTION_MODE_INLINE = "inline"
+EXECUTION_MODE_FORK = "fork"
+
+# NOTE: the max resident set size is in kilobytes on Linux, in bytes on macOS
+MAX_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+PIPE_CHUNK_SIZE = 64 * 1024
+# the seconds between checks that a forked child has exited, with its pipe still open
+CHILD_POLL_INTERVAL = 0.5
+# the max chunks read from the pipe once the child has exited, as processes
+# escaped from its process group may still be writing into it
+PIPE_DRAIN_CHUNKS = 16
+
+
+@lru_cache(maxsize=None)
+def get_command_class(app_name: str, name: str) -> Type[BaseCommand]:
+    """Return the class of a command, imported once in each process."""
+    return type(load_command_class(app_name, name))
+
+
+@lru_cache(maxsize=None)
+def get_command_help(app_name: str, name: str) -> str:
+    """Return the help text of a command, built once in each process."""
+    output = StringIO()
+    get_command_class(app_name, name)().create_parser("", name).print_help(
+        file=output
+    )
+    return output.getvalue()
+
+
+def preload_commands() -> int:
+    """Import the classes of the active commands, to execute them without delay.
+
+    :return: the number of commands loaded
+    """
+    from taskmanager.models import AppCommand
+
+    n_loaded = 0
+    for app_name, name in AppCommand.objects.filter(active=True).values_list(
+        "app_name", "name"
+    ):
+        try:
+            get_command_class(app_name, name)
+        except Exception:
+            # NOTE: missing commands fail when executed, with a report
+            continue
+        n_loaded += 1
+    return n_loaded
+
+
+def register_spooler_preloading() -> None:
+    """Preload the commands in the spooler processes, once forked."""
+    from taskmanager.uwsgidecorators_wrapper import postfork
+
+    @postfork
+    def preload_spooler_commands():
+        import uwsgi
+
+        if uwsgi.i_am_the_spooler():
+            preload_commands()
+
+
+class CommandTimeout(BaseException):
+    """Raised in the thread executing a command, when running out of time.
+
+    As `KeyboardInterrupt`, it is not caught by `except Exception` clauses
+    of the command.
+    """
+
+
+class Watchdog:
+    """Interrupt the current thread, raising `CommandTimeout` after a timeout.
+
+    In the main thread, the exception is raised by the handler of a `SIGALRM`
+    timer, so a command blocked in a system call (e.g. waiting for a socket)
+    is interrupted at once.
+    Signals are handled in the main thread only: in other threads, or when
+    the handler of `SIGALRM` has not been installed from Python and could
+    not be restored, the exception is raised asynchronously by a timer thread,
+    so a command blocked in a call to C code is interrupted as soon as
+    the call returns.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        """Set the timeout in seconds, None not to interrupt the thread."""
+        self.timeout = timeout
+        self.expired = False
+        self._thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self._done = False
+        self._timer: Optional[threading.Timer] = None
+        self._alarm_set = False
+        self._previous_handler: Any = signal.SIG_DFL
+
+    def __enter__(self) -> "Watchdog":
+        """Start the timer of the timeout, if any."""
+        if not self.timeout:
+            return self
+        if (
+            threading.current_thread() is threading.main_thread()
+            and signal.getsignal(signal.SIGALRM) is not None
+        ):
+            self._previous_handler = signal.signal(signal.SIGALRM, self._alarm)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            self._alarm_set = True
+        else:
+            self._timer = threading.Timer(self.timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def _alarm(self, signum, frame) -> None:
+        if not self._done:
+            self.expired = True
+            raise CommandTimeout
+
+    def _expire(self) -> None:
+        with self._lock:
+            if not self._done:
+                self.expired = True
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(self._thread_id), ctypes.py_object(CommandTimeout)
+                )
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop the timer, clearing the exception if not raised yet."""
+        with self._lock:
+            self._done = True
+            if self._alarm_set:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, self._previous_handler)
+            if self._timer:
+                self._timer.cancel()
+                if self.expired:
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                        ctypes.c_ulong(self._thread_id), None
+                    )
+
+
+class ForkedResult(NamedTuple):
+    """The outcome of a command executed in a child process."""
+
+    exit_status: int
+    """The exit code of the child, or the negative number of the killing signal."""
+
+    usage: Dict[str, float]
+    """The resources used by the child, by the fields of the reports."""
+
+    timed_out: bool = False
+    """Whether the child has been killed, running out of time."""
+
+
+def get_resource_usage(
+    rusage=None, since: Optional[Dict[str, float]] = None
+) -> Dict[str, float]:
+    """Return the resources used, by the fields of the reports.
+
+    :param rusage: the resource usage, of this process when not given
+    :param since: the resources used previously, to subtract, but for the peak memory
+    """
+    if rusage is None:
+        import resource
+
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+    usage = {
+        "cpu_user": rusage.ru_utime,
+        "cpu_system": rusage.ru_stime,
+        "io_read_blocks": rusage.ru_inblock,
+        "io_write_blocks": rusage.ru_oublock,
+    }
+    if since:
+        for field in usage:
+            usage[field] -= since[field]
+    usage["max_rss"] = rusage.ru_maxrss * MAX_RSS_UNIT
+    return usage
+
+
+def set_resource_limits(
+    max_memory: Optional[int] = None, max_cpu: Optional[int] = None
+) -> None:
+    """Limit the address space (bytes) and CPU time (seconds) of this process."""
+    import resource
+
+    if max_memory:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+    if max_cpu:
+        # NOTE: SIGXCPU is sent at the soft limit, SIGKILL at the hard one
+        resource.setrlimit(resource.RLIMIT_CPU, (max_cpu, max_cpu + 1))
+
+
+def get_exit_status(wait_status: int) -> int:
+    """Return the exit code of a waited process, or the negative killing signal."""
+    if os.WIFSIGNALED(wait_status):
+        return -os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
+
+
+def _exec_child(
+    write_fd: int,
+    command: Union[str, BaseCommand],
+    args: Sequence[str],
+    max_memory: Optional[int],
+    max_cpu: Optional[int],
+) -> None:
+    """Execute the command in the child process, writing its output to the pipe.
+
+    The pipe replaces the file descriptors 1 and 2 of the child, so that the output
+    written by `print`, C extensions and subprocesses is captured as well.
+    """
+    exit_status = 1
+    try:
+        # NOTE: in a process group of its own, killed as a whole on timeout
+        os.setpgid(0, 0)
+        # NOTE: the connections inherited from the parent are dropped, not closed,
+        # so that the child opens its own ones, whatever the state of the parent
+        for connection in db.connections.all():
+            connection.connection = None
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        if write_fd not in (1, 2):
+            os.close(write_fd)
+        out = os.fdopen(
+            1, "w", buffering=1, encoding="utf-8", errors="replace", closefd=False
+        )
+        sys.stdout = sys.stderr = out
+        try:
+            set_resource_limits(max_memory, max_cpu)
+            call_command(command, *args, stdout=out, stderr=out)
+            exit_status = 0
+        except SystemExit as e:
+            exit_status = e.code if isinstance(e.code, int) else 1
+        except BaseException as e:
+            out.write(f"EXCEPTION raised: {e}")
+        finally:
+            # the streams of the parent, held by loggers, are written to the pipe too
+            for stream in (out, sys.__stdout__, sys.__stderr__):
+                try:
+                    if stream:
+                        stream.flush()
+                except (OSError, ValueError):
+                    pass
+    finally:
+        # NOTE: skip the clean-up of the resources inherited from the parent
+        os._exit(exit_status)
+
+
+def run_command_forked(
+    command: Union[str, BaseCommand],
+    args: Sequence[str],
+    stdout: TextIOBase,
+    max_memory: Optional[int] = None,
+    max_cpu: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> ForkedResult:
+    """Execute a management command in a forked child process, with resource limits.
+
+    The output of the child, both stdout and stderr, is streamed into `stdout`
+    while the command runs, so that memory used by the command is freed as
+    soon as the child exits, and a runaway command does not take down the caller.
+
+    The child runs in a process group of its own, killed as a whole on timeout.
+    The pipe is read until the deadline, or until the child exits, even when
+    still held open by processes it started.
+
+    :param command: the name of the command, or the command itself
+    :param args: the arguments of the command
+    :param stdout: the stream the output of the command is written to
+    :param max_memory: the max address space of the child, in bytes
+    :param max_cpu: the max CPU time of the child, in seconds
+    :param timeout: the seconds after which the child is killed
+    """
+    read_fd, write_fd = os.pipe()
+    # NOTE: flushed before forking, not to write the pending output twice
+    for stream in (sys.stdout, sys.stderr):
+        if stream:
+            stream.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _exec_child(write_fd, command, args, max_memory, max_cpu)
+    os.close(write_fd)
+    try:
+        # NOTE: set in both processes, whichever runs first
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out = False
+    exited = False
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    with os.fdopen(read_fd, "rb", buffering=0) as pipe:
+
+        def read_chunk(wait: float) -> Optional[int]:
+            """Write a chunk of the output to `stdout`, None if none is ready in time."""
+            if not select.select([pipe], [], [], wait)[0]:
+                return None
+            chunk = pipe.read(PIPE_CHUNK_SIZE)
+            stdout.write(decoder.decode(chunk))
+            return len(chunk)
+
+        while True:
+            wait = CHILD_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    timed_out = True
+                    try:
+                        os.killpg(pid, signal.SIGKILL)
+                    except OSError:
+                        # the process group is not set yet: the child only
+                        os.kill(pid, signal.SIGKILL)
+                    break
+            n_read = read_chunk(wait)
+            if n_read is None:
+                # NOTE: the pipe may be held open by the processes started by the child
+                exited_pid, wait_status, rusage = os.wait4(pid, os.WNOHANG)
+                if exited_pid:
+                    exited = True
+                    break
+            elif not n_read:
+                break
+        if not exited:
+            _, wait_status, rusage = os.wait4(pid, 0)
+        for _ in range(PIPE_DRAIN_CHUNKS):
+            if not read_chunk(0):
+                break
+        stdout.write(decoder.decode(b"", final=True))
+    return ForkedResult(
+        exit_status=get_exit_status(wait_status),
+        usage=get_resource_usage(rusage),
+        timed_out=timed_out,
+    )
@@ -0,0 +1,620 @@
+"""Define report logfile writers and readers for the taskmanager app.
+
+Along with each report logfile, a line index sidecar file is written,
+with the extension `.idx`.
+
+The index is an array of unsigned 64 bits little-endian integers, one for
+each line of the log: the byte offset at which the line ends, including the
+newline character. The line `n` of the log starts at the offset where the
+line `n - 1` ends (or at 0), so any line can be reached with a single seek,
+whatever the size of the log.
+
+The index is written as the log grows, so a log may be longer than its index:
+the lines following the last indexed one are read sequentially.
+While the log is written, the index is flushed every `INDEX_FLUSH_LINES` lines
+or `INDEX_FLUSH_INTERVAL` seconds, so it lags behind by a few lines at most.
+
+Level indexes are written too, one for each of the `INDEXED_LEVELS`,
+with the extension `.<level>.idx` (e.g. `.error.idx`): arrays of the numbers
+of the lines at that level, so that they are reached without scanning the log.
+
+Finished logs can be compressed into a block-compressed file, with the
+extension `.gz`: a sequence of independent gzip members, each one holding
+a block of whole lines, so that the file can still be read with `zcat`.
+The blocks table, with the extension `.blocks`, holds a pair of offsets for
+each block, as unsigned 64 bits little-endian integers: the offset at which
+the block ends in the log, and the offset at which it ends in the compressed
+file. Offsets of the line index always refer to the uncompressed log,
+so that any line is reached decompressing a single block.
+"""
+
+import array
+import bisect
+import collections
+import gzip
+import io
+import itertools
+import operator
+import os
+import struct
+import sys
+import threading
+import time
+from typing import (
+    IO,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+LOGFILE_ENCODING = "utf-8"
+LEVELS = ("ERROR", "WARNING", "INFO", "DEBUG")
+INDEXED_LEVELS = ("ERROR", "WARNING")
+INDEX_SUFFIX = ".idx"
+INDEX_ITEM = struct.Struct("<Q")
+COMPRESSED_SUFFIX = ".gz"
+BLOCKS_SUFFIX = ".blocks"
+BLOCK_SIZE = 64 * 1024
+INDEX_FLUSH_LINES = 1000
+INDEX_FLUSH_INTERVAL = 1.0
+
+
+def index_path(path: str) -> str:
+    """Return the path of the line index of a logfile."""
+    return path + INDEX_SUFFIX
+
+
+def level_index_path(path: str, level: str) -> str:
+    """Return the path of the index of the lines at a level of a logfile."""
+    return f"{path}.{level.lower()}{INDEX_SUFFIX}"
+
+
+def compressed_path(path: str) -> str:
+    """Return the path of the compressed logfile."""
+    return path + COMPRESSED_SUFFIX
+
+
+def blocks_path(path: str) -> str:
+    """Return the path of the blocks table of the compressed logfile."""
+    return compressed_path(path) + BLOCKS_SUFFIX
+
+
+def remove_logfile(path: str) -> None:
+    """Remove a logfile along with its sidecar files, if they exist."""
+    for file_path in (
+        path,
+        index_path(path),
+        *(level_index_path(path, level) for level in INDEXED_LEVELS),
+        compressed_path(path),
+        blocks_path(path),
+    ):
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def compress_logfile(path: str, block_size: int = BLOCK_SIZE) -> None:
+    """
+    Compress a finished logfile into a block-compressed file.
+
+    Each block holds at least `block_size` bytes of the log, up to the end
+    of a line. The plain logfile is removed once the compressed one is complete.
+    """
+    tmp_suffix = ".tmp"
+    blocks = array.array("Q")
+    compressed_end = 0
+    with open(path, "rb") as log_file, open(
+        compressed_path(path) + tmp_suffix, "wb"
+    ) as compressed_file:
+        while True:
+            block = log_file.read(block_size)
+            if not block:
+                break
+            if not block.endswith(b"\n"):
+                block += log_file.readline()
+            compressed_block = gzip.compress(block, mtime=0)
+            compressed_file.write(compressed_block)
+            compressed_end += len(compressed_block)
+            blocks.extend((log_file.tell(), compressed_end))
+    if sys.byteorder == "big":
+        blocks.byteswap()
+    with open(blocks_path(path) + tmp_suffix, "wb") as blocks_file:
+        blocks.tofile(blocks_file)
+    os.replace(blocks_path(path) + tmp_suffix, blocks_path(path))
+    os.replace(compressed_path(path) + tmp_suffix, compressed_path(path))
+    os.unlink(path)
+
+
+class BlockCompressedFile(io.RawIOBase):
+    """
+    A read-only, seekable binary stream over a block-compressed logfile.
+
+    Only the block holding the current position is decompressed.
+    """
+
+    def __init__(self, path: str):
+        """Open the compressed logfile and load its blocks table."""
+        super().__init__()
+        blocks = array.array("Q")
+        with open(blocks_path(path), "rb") as blocks_file:
+            blocks.frombytes(blocks_file.read())
+        if sys.byteorder == "big":
+            blocks.byteswap()
+        self._ends = blocks[::2]
+        self._compressed_ends = blocks[1::2]
+        self._size = self._ends[-1] if self._ends else 0
+        self._file = open(compressed_path(path), "rb")
+        self._position = 0
+        self._block_n: Optional[int] = None
+        self._block = b""
+
+    def readable(self) -> bool:
+        """Return True, as the stream is readable."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return True, as the stream is seekable."""
+        return True
+
+    def tell(self) -> int:
+        """Return the current position in the uncompressed log."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a position in the uncompressed log."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        """Read bytes from the current position into a buffer."""
+        n = bisect.bisect_right(self._ends, self._position)
+        if n >= len(self._ends):
+            return 0
+        if n != self._block_n:
+            start = self._compressed_ends[n - 1] if n else 0
+            self._file.seek(start)
+            self._block = gzip.decompress(
+                self._file.read(self._compressed_ends[n] - start)
+            )
+            self._block_n = n
+        start = self._position - (self._ends[n - 1] if n else 0)
+        data = memoryview(self._block)[start:start + len(buffer)]
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        """Close the compressed logfile."""
+        self._file.close()
+        super().close()
+
+
+def _decode(line: bytes) -> str:
+    return line.decode(LOGFILE_ENCODING, "replace")
+
+
+def _read_item(f: IO[bytes], n: int) -> int:
+    f.seek(n * INDEX_ITEM.size)
+    return INDEX_ITEM.unpack(f.read(INDEX_ITEM.size))[0]
+
+
+class _IndexWriter(object):
+    """An index file, where items are appended as they are flushed."""
+
+    def __init__(self, path: str):
+        self.items = array.array("Q")
+        # NOTE: unbuffered, the pending items are written at once when flushed
+        self._file = open(path, "wb", buffering=0)
+
+    def flush(self) -> None:
+        if self.items:
+            if sys.byteorder == "big":
+                self.items.byteswap()
+            self.items.tofile(self._file)
+            self.items = array.array("Q")
+
+    def truncate(self) -> None:
+        """Drop the items, written or pending."""
+        self.items = array.array("Q")
+        self._file.seek(0)
+        self._file.truncate()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+class LogChunk(NamedTuple):
+    """A chunk of log lines read from an offset."""
+
+    lines: List[str]
+    """The lines read, matching the terms searched, if any."""
+    offset: int
+    """The byte offset at which the chunk ends, to continue reading from."""
+    level_counts: Dict[str, int]
+    """The number of lines read at each level, whether matching or not."""
+    n_lines: int
+    """The number of lines read, whether matching or not."""
+    eof: bool
+    """Whether all the lines available have been read."""
+
+
+class ReportLogWriter(io.TextIOBase):
+    """
+    A text stream writing the log of a task execution into the report logfile.
+
+    It is passed as `stdout` to `call_command`, and keeps count of lines,
+    errors and warnings, along with the last lines of the log,
+    while the output is being written.
+
+    This way the fields of the report are available as soon as the command
+    returns, without reading the logfile again.
+
+    The offsets of the lines are written in the line index of the logfile,
+    and the numbers of the lines at the `INDEXED_LEVELS` in the level indexes.
+
+    By default the logfile is flushed whenever a line is completed, while its
+    indexes are flushed every `INDEX_FLUSH_LINES` lines or every
+    `INDEX_FLUSH_INTERVAL` seconds, whichever comes first, and when closed.
+    When `flush_interval` is set, the output is buffered in blocks of
+    `buffer_size` bytes, and flushed by a background thread every
+    `flush_interval` seconds, sparing a write per line to chatty commands;
+    explicit calls to `flush` are then ignored.
+
+    A write interrupted by an exception raised asynchronously (e.g. by the
+    timeout of the command) leaves the accounting out of step with the logfile:
+    the logfile is then accounted for again, and its indexes rewritten.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        n_tail_lines: int = 10,
+        flush_interval: Optional[float] = None,
+        buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+    ):
+        """Open the logfile and its indexes for writing."""
+        self.name = path
+        self.n_lines = 0
+        self.n_errors = 0
+        self.n_warnings = 0
+        self.n_tail_lines = n_tail_lines
+        self.tail_lines: Deque[bytes] = collections.deque(maxlen=n_tail_lines)
+        self.flush_interval = flush_interval
+        self._partial_line = b""
+        self._offset = 0
+        # NOTE: flushed at each line anyway, the logfile is unbuffered by default
+        self._file = open(path, "wb", buffering=buffer_size if flush_interval else 0)
+        self._index = _IndexWriter(index_path(path))
+        self._level_indexes = {
+            level: _IndexWriter(level_index_path(path, level))
+            for level in INDEXED_LEVELS
+        }
+        self._indexes = [self._index, *self._level_indexes.values()]
+        self._index_flush_deadline = time.monotonic() + INDEX_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name=f"flush {path}", daemon=True
+            )
+            self._flusher.start()
+
+    @property
+    def closed(self) -> bool:
+        """Return True if the logfile has been closed."""
+        return self._file.closed
+
+    def isatty(self) -> bool:
+        """Return False, as the logfile is never interactive."""
+        return False
+
+    def write(self, data: str) -> int:
+        """Write data to the logfile and account for the completed lines."""
+        encoded = data.encode(LOGFILE_ENCODING, "replace")
+        with self._lock:
+            try:
+                self._file.write(encoded)
+                if b"\n" not in encoded:
+                    self._partial_line += encoded
+                else:
+                    chunk = self._partial_line + encoded
+                    if chunk.endswith(b"\n"):
+                        self._partial_line = b""
+                    else:
+                        end = chunk.rindex(b"\n") + 1
+                        chunk, self._partial_line = chunk[:end], chunk[end:]
+                    self._account(chunk)
+                    # line buffering: flush whenever a line is completed
+                    if not self.flush_interval:
+                        self._flush_lines()
+            except BaseException:
+                self._reaccount()
+                raise
+        return len(data)
+
+    def flush(self) -> None:
+        """Flush the logfile, unless flushed periodically by the background thread."""
+        if not self.flush_interval:
+            with self._lock:
+                try:
+                    self._flush_lines()
+                except BaseException:
+                    self._reaccount()
+                    raise
+
+    def close(self) -> None:
+        """Account for the last line, if not terminated, and close the logfile."""
+        if self._flusher:
+            self._closing.set()
+            self._flusher.join()
+        with self._lock:
+            if self._partial_line:
+                self._account(self._partial_line)
+                self._partial_line = b""
+            self._file.close()
+            for index in self._indexes:
+                index.close()
+
+    def _flush(self) -> None:
+        # the logfile first, so that indexed lines are always in the logfile
+        self._file.flush()
+        self._flush_indexes()
+
+    def _flush_lines(self) -> None:
+        # NOTE: the indexes every few lines only, as readers tolerate their lag
+        self._file.flush()
+        if (
+            len(self._index.items) >= INDEX_FLUSH_LINES
+            or time.monotonic() >= self._index_flush_deadline
+        ):
+            self._flush_indexes()
+
+    def _flush_indexes(self) -> None:
+        for index in self._indexes:
+            if index.items:
+                index.flush()
+        self._index_flush_deadline = time.monotonic() + INDEX_FLUSH_INTERVAL
+
+    def _reaccount(self) -> None:
+        """Account for the whole logfile again, rewriting its indexes."""
+        self._file.flush()
+        self._offset = self.n_lines = self.n_errors = self.n_warnings = 0
+        self._partial_line = b""
+        self.tail_lines.clear()
+        for index in self._indexes:
+            index.truncate()
+        with open(self.name, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                chunk = self._partial_line + block
+                end = chunk.rfind(b"\n") + 1
+                chunk, self._partial_line = chunk[:end], chunk[end:]
+                if chunk:
+                    self._account(chunk)
+        for index in self._indexes:
+            index.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._closing.wait(self.flush_interval):
+            with self._lock:
+                self._flush()
+
+    def _account(self, chunk: bytes) -> None:
+        """Account for the lines of a chunk, each one terminated but the last of the log."""
+        if chunk.count(b"\n") <= 1:
+            lines = [chunk.rstrip(b"\n")]
+            self._index.items.append(self._offset + len(chunk))
+        else:
+            lines = chunk.split(b"\n")
+            if not lines[-1]:
+                lines.pop()
+            # the offset at which each line ends, past its newline character
+            self._index.items.extend(
+                map(
+                    operator.add,
+                    itertools.accumulate(map(len, lines)),
+                    itertools.count(self._offset + 1),
+                )
+            )
+        self._offset += len(chunk)
+        # NOTE: lines are scanned one by one only if the chunk has some at a level
+        if b"ERROR" in chunk or b"WARNING" in chunk:
+            for n, line in enumerate(lines, self.n_lines):
+                if b"ERROR" in line:
+                    self.n_errors += 1
+                    self._level_indexes["ERROR"].items.append(n)
+                elif b"WARNING" in line:
+                    self.n_warnings += 1
+                    self._level_indexes["WARNING"].items.append(n)
+        self.n_lines += len(lines)
+        self.tail_lines.extend(lines)
+
+    @property
+    def log_tail(self) -> str:
+        """Return the last lines of the log, preceded by the number of hidden ones."""
+        lines = [_decode(line) for line in self.tail_lines]
+        hidden_lines = self.n_lines - self.n_tail_lines
+        if hidden_lines > 0:
+            lines.insert(0, f"{hidden_lines} lines hidden ...")
+        return "\n".join(lines)
+
+
+class LogReader(object):
+    """
+    A reader of report logfiles, seeking lines through the line index.
+
+    Logfiles without an index (e.g. written by previous versions)
+    are read sequentially, without ever loading the whole log in memory.
+    """
+
+    def __init__(self, path: str):
+        """Set the path of the logfile to read."""
+        self.path = path
+
+    def exists(self) -> bool:
+        """Return True if the logfile exists, either plain or compressed."""
+        return os.path.exists(self.path) or self.is_compressed()
+
+    def is_compressed(self) -> bool:
+        """Return True if the logfile has been compressed."""
+        return os.path.exists(compressed_path(self.path))
+
+    def open(self) -> IO[bytes]:
+        """Open the logfile for reading, as a binary stream."""
+        if not os.path.exists(self.path) and self.is_compressed():
+            return io.BufferedReader(BlockCompressedFile(self.path))
+        return open(self.path, "rb")
+
+    def size(self) -> int:
+        """Return the size of the log in bytes, or 0 if it does not exist."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            pass
+        if self.is_compressed():
+            with self.open() as f:
+                return f.seek(0, io.SEEK_END)
+        return 0
+
+    @property
+    def n_indexed_lines(self) -> int:
+        """Return the number of lines in the index."""
+        try:
+            return os.path.getsize(index_path(self.path)) // INDEX_ITEM.size
+        except FileNotFoundError:
+            return 0
+
+    def line_offset(self, n: int) -> int:
+        """Return the byte offset at which the line `n` starts."""
+        if n <= 0:
+            return 0
+        n_indexed_lines = self.n_indexed_lines
+        if n <= n_indexed_lines:
+            return self._line_end(n - 1)
+        offset = self._line_end(n_indexed_lines - 1) if n_indexed_lines else 0
+        with self.open() as f:
+            f.seek(offset)
+            for line in itertools.islice(f, n - n_indexed_lines):
+                offset += len(line)
+        return offset
+
+    def _line_end(self, n: int) -> int:
+        with open(index_path(self.path), "rb") as f:
+            return _read_item(f, n)
+
+    def has_level_index(self, level: str) -> bool:
+        """Return True if the logfile has the index of the lines at `level`."""
+        return os.path.exists(level_index_path(self.path, level))
+
+    def count_level_lines(self, level: str) -> int:
+        """Return the number of lines at `level`, through its index."""
+        return os.path.getsize(level_index_path(self.path, level)) // INDEX_ITEM.size
+
+    def level_lines(
+        self, level: str, start: int = 0, count: Optional[int] = None
+    ) -> List[str]:
+        """Return `count` lines at `level` (all if None), from the `start`-th one.
+
+        Each line is reached through the level index and the line index,
+        so that only the requested lines are read.
+        """
+        n_level_lines = self.count_level_lines(level)
+        stop = n_level_lines if count is None else min(start + count, n_level_lines)
+        n_indexed_lines = self.n_indexed_lines
+        lines = []
+        with open(level_index_path(self.path, level), "rb") as level_index, open(
+            index_path(self.path), "rb"
+        ) as index, self.open() as f:
+            for i in range(start, stop):
+                n = _read_item(level_index, i)
+                if n >= n_indexed_lines:
+                    break
+                f.seek(_read_item(index, n - 1) if n else 0)
+                lines.append(_decode(f.readline().rstrip(b"\n")))
+        return lines
+
+    def count_lines(self) -> int:
+        """Return the number of lines in the log."""
+        n_indexed_lines = self.n_indexed_lines
+        offset = self._line_end(n_indexed_lines - 1) if n_indexed_lines else 0
+        with self.open() as f:
+            f.seek(offset)
+            return n_indexed_lines + sum(1 for _ in f)
+
+    def iter_lines(self, start: int = 0) -> Iterator[str]:
+        """Iterate over the lines of the log, starting from the line `start`."""
+        with self.open() as f:
+            f.seek(self.line_offset(start))
+            for line in f:
+                yield _decode(line.rstrip(b"\n"))
+
+    def read_from(
+        self,
+        offset: int,
+        terms: Optional[Sequence[str]] = None,
+        level: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_lines: Optional[int] = None,
+        hold_partial: bool = False,
+    ) -> LogChunk:
+        """
+        Return the chunk of the log from the byte `offset`.
+
+        The chunk ends at the end of the log, or before exceeding `max_bytes`
+        or `max_lines`, if given, always at the end of a line.
+        With `hold_partial`, a last line not terminated yet (the log is still
+        being written) is left to be read with the next chunk.
+
+        Lines are filtered while they are read: only the lines containing
+        one of the `terms`, if given, at the `level`, if given, are returned.
+        The level of each line read is counted, whether it matches or not.
+        """
+        encoded_terms = [t.encode(LOGFILE_ENCODING) for t in terms or () if t]
+        encoded_levels = [(x, x.encode(LOGFILE_ENCODING)) for x in LEVELS]
+        level_counts = dict.fromkeys(LEVELS, 0)
+        lines = []
+        n_lines = 0
+        n_bytes = 0
+        eof = True
+        with self.open() as f:
+            f.seek(offset)
+            for line in f:
+                if hold_partial and not line.endswith(b"\n"):
+                    break
+                if n_lines and (
+                    (max_lines and n_lines >= max_lines)
+                    or (max_bytes and n_bytes + len(line) > max_bytes)
+                ):
+                    eof = False
+                    break
+                n_lines += 1
+                n_bytes += len(line)
+                line_level = next(
+                    (x for x, encoded_x in encoded_levels if encoded_x in line), None
+                )
+                if line_level:
+                    level_counts[line_level] += 1
+                if level and line_level != level:
+                    continue
+                if encoded_terms and not any(t in line for t in encoded_terms):
+                    continue
+                lines.append(_decode(line.rstrip(b"\n")))
+        return LogChunk(lines, offset + n_bytes, level_counts, n_lines, eof)
+
+    def lines(self, start: int = 0, count: Optional[int] = None) -> List[str]:
+        """Return `count` lines of the log (all if None), from the line `start`."""
+        return list(itertools.islice(self.iter_lines(start), count))
+
+    def tail(self, count: int) -> List[str]:
+        """Return the last `count` lines of the log."""
+        return self.lines(max(self.count_lines() - count, 0), count)
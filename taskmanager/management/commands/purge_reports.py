@@ -0,0 +1,230 @@
+"""Purge reports command."""
+
+import datetime
+import os
+import shutil
+
+from django.db.models import Count
+from django.utils import timezone
+
+from taskmanager.logfile import (
+    BLOCKS_SUFFIX,
+    COMPRESSED_SUFFIX,
+    INDEX_SUFFIX,
+    INDEXED_LEVELS,
+)
+from taskmanager.management.base import LoggingBaseCommand
+from taskmanager.models import Report
+from taskmanager.settings import (
+    UWSGI_TASKMANAGER_N_REPORTS_INLINE,
+    UWSGI_TASKMANAGER_RETENTION_DAYS,
+    UWSGI_TASKMANAGER_RETENTION_MAX_BYTES,
+)
+from taskmanager.utils import get_logs_root, get_logs_shard_dir
+
+
+class Command(LoggingBaseCommand):
+    """Command to purge reports and their logfiles, following the retention settings.
+
+    Reports are purged when:
+    - older than `UWSGI_TASKMANAGER_RETENTION_DAYS` days;
+    - exceeding the last `UWSGI_TASKMANAGER_N_REPORTS_INLINE` reports of a task;
+    - the oldest ones, while logfiles take more than
+      `UWSGI_TASKMANAGER_RETENTION_MAX_BYTES` bytes.
+
+    Expired logfiles are removed a whole day directory at a time.
+    Reports still running, as the ones of sharded runs whose shards still are,
+    are not purged, nor are the day directories of their logfiles removed.
+    """
+
+    help = "Purge reports and their logfiles, following the retention settings."
+
+    verbosity = None
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "--days", dest="days", type=int, default=UWSGI_TASKMANAGER_RETENTION_DAYS,
+            help="Purge reports older than this number of days.",
+        )
+        parser.add_argument(
+            "--max-reports", dest="max_reports", type=int,
+            default=UWSGI_TASKMANAGER_N_REPORTS_INLINE,
+            help="Keep at most this number of reports for each task.",
+        )
+        parser.add_argument(
+            "--max-bytes", dest="max_bytes", type=int,
+            default=UWSGI_TASKMANAGER_RETENTION_MAX_BYTES,
+            help="Purge the oldest reports while logfiles take more than these bytes.",
+        )
+        parser.add_argument(
+            "--batch-size", dest="batch_size", type=int, default=1000,
+            help="Number of reports deleted with each query.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run", action='store_true',
+            help="Show logs, do not modify data in DB.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        self.setup_logger(__name__, formatter_key="simple", **options)
+        self.dry_run = options["dry_run"]
+        self.batch_size = options["batch_size"]
+        if self.dry_run:
+            self.logger.info("Dry run mode (changes will not be persisted).")
+
+        if options["days"]:
+            self.purge_by_age(options["days"])
+        if options["max_reports"]:
+            self.purge_by_count(options["max_reports"])
+        if options["max_bytes"] is not None:
+            self.purge_by_size(options["max_bytes"])
+        if not self.dry_run:
+            self.remove_empty_dirs()
+
+        self.logger.info("Procedure completed.")
+
+    def purge(self, reports, removed_dirs=()):
+        """Purge the reports, or just count them in dry run mode."""
+        if self.dry_run:
+            return reports.count()
+        return reports.purge(batch_size=self.batch_size, removed_dirs=removed_dirs)
+
+    def purge_by_age(self, days):
+        """Purge reports older than `days`, removing whole day directories."""
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        # logfiles are sharded by local date: keep one more day, to be safe
+        live_dirs = self.get_live_dirs()
+        expired_dirs = [
+            expired_dir
+            for expired_dir in self.get_expired_dirs(
+                datetime.date.today() - datetime.timedelta(days=days + 1)
+            )
+            if expired_dir not in live_dirs
+        ]
+        n = self.purge(
+            Report.objects.finished().filter(invocation_datetime__lt=cutoff),
+            removed_dirs=set(expired_dirs),
+        )
+        if not self.dry_run:
+            for expired_dir in expired_dirs:
+                shutil.rmtree(expired_dir, ignore_errors=True)
+        self.logger.info(
+            f"{n} reports older than {days} days purged, "
+            f"{len(expired_dirs)} day directories removed."
+        )
+
+    def get_expired_dirs(self, before):
+        """Return the day directories of logfiles, for days before `before`."""
+        logs_root = get_logs_root()
+        expired_dirs = []
+        for year in self.list_numeric_dirs(logs_root):
+            for month in self.list_numeric_dirs(os.path.join(logs_root, year)):
+                for day in self.list_numeric_dirs(os.path.join(logs_root, year, month)):
+                    try:
+                        date = datetime.date(int(year), int(month), int(day))
+                    except ValueError:
+                        continue
+                    if date < before:
+                        expired_dirs.append(get_logs_shard_dir(date))
+        return expired_dirs
+
+    @staticmethod
+    def get_live_dirs():
+        """Return the day directories holding the logfiles of unfinished reports."""
+        unfinished = Report.objects.exclude(
+            pk__in=Report.objects.finished().values("pk")
+        ).exclude(logfile="")
+        return {
+            os.path.dirname(os.path.dirname(logfile))
+            for logfile in unfinished.values_list("logfile", flat=True)
+        }
+
+    @staticmethod
+    def list_numeric_dirs(path):
+        """Return the names of the sub-directories of `path` made of digits."""
+        try:
+            return [e.name for e in os.scandir(path) if e.is_dir() and e.name.isdigit()]
+        except FileNotFoundError:
+            return []
+
+    def purge_by_count(self, max_reports):
+        """Purge reports exceeding the last `max_reports` reports of each task.
+
+        The reports of the shards are purged along with their parent report,
+        and are not counted.
+        """
+        n = 0
+        reports = Report.objects.filter(parent__isnull=True)
+        tasks_ids = (
+            reports.values("task_id")
+            .annotate(n_reports=Count("id"))
+            .filter(n_reports__gt=max_reports)
+            .values_list("task_id", flat=True)
+        )
+        for task_id in tasks_ids:
+            task_reports = reports.filter(task_id=task_id)
+            last_reports_ids = list(
+                task_reports.order_by("-id")[:max_reports].values_list("id", flat=True)
+            )
+            n += self.purge(task_reports.exclude(pk__in=last_reports_ids))
+        self.logger.info(f"{n} reports exceeding {max_reports} per task purged.")
+
+    def purge_by_size(self, max_bytes):
+        """Purge the oldest reports, while logfiles take more than `max_bytes`."""
+        total_size = self.get_dir_size(get_logs_root())
+        purged_ids = []
+        reports = Report.objects.finished().exclude(logfile="").order_by("id")
+        for pk, logfile in reports.values_list("pk", "logfile").iterator():
+            if total_size <= max_bytes:
+                break
+            total_size -= self.get_logfile_size(logfile)
+            purged_ids.append(pk)
+        n = self.purge(Report.objects.filter(pk__in=purged_ids))
+        self.logger.info(
+            f"{n} reports purged, to keep logfiles within {max_bytes} bytes."
+        )
+
+    @classmethod
+    def get_dir_size(cls, path):
+        """Return the size of the files in a directory tree."""
+        size = 0
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                size += cls.get_dir_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                size += entry.stat(follow_symlinks=False).st_size
+        return size
+
+    @staticmethod
+    def get_logfile_size(logfile):
+        """Return the size of a logfile and its sidecar files."""
+        size = 0
+        for suffix in (
+            "",
+            INDEX_SUFFIX,
+            *(f".{level.lower()}{INDEX_SUFFIX}" for level in INDEXED_LEVELS),
+            COMPRESSED_SUFFIX,
+            COMPRESSED_SUFFIX + BLOCKS_SUFFIX,
+        ):
+            try:
+                size += os.path.getsize(logfile + suffix)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def remove_empty_dirs(self):
+        """Remove the empty directories left in the logs root."""
+        logs_root = get_logs_root()
+        for dirpath, dirnames, filenames in os.walk(logs_root, topdown=False):
+            if dirpath != logs_root and not dirnames and not filenames:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
@@ -0,0 +1,46 @@
+"""Recompute next rides command."""
+
+from taskmanager.management.base import LoggingBaseCommand
+from taskmanager.models import Task
+
+
+class Command(LoggingBaseCommand):
+    """Command to recompute the cached next ride of all tasks, in bulk.
+
+    Useful after changes to the scheduling logic or to the time zone settings.
+    """
+
+    help = "Recompute the cached next ride of all tasks, in bulk."
+
+    verbosity = None
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "--batch-size", dest="batch_size", type=int, default=2000,
+            help="Number of tasks read and updated with each query.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run", action='store_true',
+            help="Show logs, do not modify data in DB.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        self.setup_logger(__name__, formatter_key="simple", **options)
+
+        tasks = Task.objects.all()
+        if options["dry_run"]:
+            self.logger.info("Dry run mode (changes will not be persisted).")
+            n = sum(
+                task.cached_next_ride != next_ride
+                for task, next_ride in tasks.iter_next_rides(
+                    chunk_size=options["batch_size"]
+                )
+            )
+            self.logger.info(f"{n} tasks would be updated.")
+        else:
+            n = tasks.update_next_rides(batch_size=options["batch_size"])
+            self.logger.info(f"{n} tasks updated.")
+        self.logger.info("Procedure completed.")
@@ -1,13 +1,18 @@
 import datetime
+import os
+
 from taskmanager.management.base import LoggingBaseCommand
-from os.path import exists
 from taskmanager.models import Task
+from taskmanager.settings import UWSGI_TASKMANAGER_DISPATCHER
 
 
 class Command(LoggingBaseCommand):
     """Command to re-start all tasks being in a SPOOLED state, but missing the spooler file.
 
     This happens when a container restarts and no volume is there for the peristence.
+
+    The spooler directories are listed once, and the de-spooled tasks are the ones
+    whose spooler file is not among the listed ones.
     """
 
     help = "Command to re-start all de-spooled tasks (being in a SPOOLED state, but missing the spooler file)."
@@ -20,43 +25,86 @@ class Command(LoggingBaseCommand):
             dest="dry_run", action='store_true',
             help="Show logs, do not modify data in DB.",
         )
+        parser.add_argument(
+            "--statuses",
+            dest="statuses", default=Task.STATUS_SPOOLED,
+            help=(
+                "Comma separated statuses of the tasks to repair, "
+                f"among {Task.STATUS_SPOOLED}, {Task.STATUS_SCHEDULED} "
+                f"and {Task.STATUS_STARTED}."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size", type=int, default=500,
+            help="Number of tasks re-started at once.",
+        )
+
+    @staticmethod
+    def list_spooler_files(spooler_ids):
+        """Return the paths of the files in the directories of the given spoolers."""
+        spooler_files = set()
+        for spooler_dir in {os.path.dirname(s) for s in spooler_ids if s}:
+            try:
+                with os.scandir(spooler_dir) as entries:
+                    spooler_files.update(entry.path for entry in entries)
+            except FileNotFoundError:
+                pass
+        return spooler_files
 
     def handle(self, *args, **options):
         self.setup_logger(__name__, formatter_key="simple", **options)
 
         dry_run = options['dry_run']
+        statuses = [s.strip() for s in options['statuses'].split(",") if s.strip()]
+        batch_size = options['batch_size']
 
-        spooled_tasks = Task.objects.filter(status='spooled')
-        if spooled_tasks:
+        spooled_tasks = Task.objects.filter(status__in=statuses)
+        if UWSGI_TASKMANAGER_DISPATCHER:
+            # tasks waiting for the dispatcher have no spooler file yet
+            spooled_tasks = spooled_tasks.exclude(spooler_id="")
+        spooler_ids = dict(spooled_tasks.values_list("pk", "spooler_id"))
+        spooler_files = self.list_spooler_files(spooler_ids.values())
+        despooled_ids = [
+            pk for pk, spooler_id in spooler_ids.items()
+            if spooler_id not in spooler_files
+        ]
+        if despooled_ids:
             self.logger.info(
-                f"{spooled_tasks.count()} de-spooled tasks found that need to be re-started were found."
+                f"{len(despooled_ids)} de-spooled tasks found that need to be re-started were found."
             )
             if dry_run:
                 self.logger.info("Dry run mode (changes will not be persisted).")
             else:
                 self.logger.info("Proceeding.")
 
-            for t in spooled_tasks:
-                if not exists(t.spooler_id):
-                    # reset task's scheduling to tomorrw, same hour and minute
-                    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
-                    t.scheduling = datetime.datetime(
-                        year=tomorrow.year,
-                        month=tomorrow.month,
-                        day=tomorrow.day,
-                        hour=t.scheduling.hour,
-                        minute=t.scheduling.minute
-                    )
-
-                    if dry_run:
-                        self.logger.info(f"Task {t} would be restarted. Next launch would be at {t.get_next_ride()}")
-                    else:
-                        self.logger.info(f"Task {t} restarted. Next launch will be at {t.get_next_ride()}")
-                        t.save()
-                        spooler_id = t.spooler_id
+            # reset tasks' scheduling to tomorrow, same hour and minute
+            tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
+            for i in range(0, len(despooled_ids), batch_size):
+                tasks = list(
+                    Task.objects.filter(pk__in=despooled_ids[i:i + batch_size])
+                    .select_related("command", "category")
+                )
+                for t in tasks:
+                    if t.scheduling:
+                        t.scheduling = datetime.datetime(
+                            year=tomorrow.year,
+                            month=tomorrow.month,
+                            day=tomorrow.day,
+                            hour=t.scheduling.hour,
+                            minute=t.scheduling.minute,
+                            tzinfo=t.scheduling.tzinfo,
+                        )
 
-                        t.stop()
-                        t.launch()
+                if dry_run:
+                    for t in tasks:
+                        self.logger.info(f"Task {t} would be restarted. Next launch would be at {t.get_next_ride()}")
+                else:
+                    Task.objects.bulk_update(tasks, ("scheduling",))
+                    Task.bulk_stop(tasks)
+                    Task.bulk_launch(tasks)
+                    for t in tasks:
+                        self.logger.info(f"Task {t} restarted. Next launch will be at {t.cached_next_ride}")
 
             self.logger.info("Procedure completed.")
         else:
@@ -0,0 +1,35 @@
+"""Run dispatcher command."""
+
+from taskmanager.dispatcher import Dispatcher
+from taskmanager.management.base import LoggingBaseCommand
+from taskmanager.settings import UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL
+
+
+class Command(LoggingBaseCommand):
+    """Command to run the dispatcher of scheduled tasks, outside of a uWSGI mule.
+
+    The dispatcher spools scheduled tasks when due; it requires the
+    `UWSGI_TASKMANAGER_DISPATCHER` setting, and should run in a single process.
+    """
+
+    help = "Run the dispatcher of scheduled tasks, spooling them when due."
+
+    verbosity = None
+
+    def add_arguments(self, parser):
+        """Add arguments method."""
+        parser.add_argument(
+            "--resync-interval",
+            dest="resync_interval",
+            type=float,
+            default=UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL,
+            help="Seconds between reloads of the scheduled tasks from the DB.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle method."""
+        self.setup_logger(__name__, formatter_key="simple", **options)
+        self.logger.info("Dispatcher started.")
+        Dispatcher(resync_interval=options["resync_interval"]).run(
+            max_timeout=options["resync_interval"]
+        )
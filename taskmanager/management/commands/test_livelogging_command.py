@@ -6,7 +6,7 @@ from taskmanager.management.base import LoggingBaseCommand
 
 class Command(LoggingBaseCommand):
     """Command for testing live logger. Perform a simple iteration, up to a maximum limit,
-    sleeping 0.1 seconds between each number generation.
+    sleeping 0.1 seconds (or --sleep seconds) between each number generation.
 
     Generates 10 numbers per second, logging them at debug level.
     Every 100 iterations generates an info message, shoinw global process.
@@ -30,6 +30,9 @@ class Command(LoggingBaseCommand):
         parser.add_argument(
             "--warning-prob", default="15", dest="warning_prob", type=int, help="Probability of warning emission (%)"
         )
+        parser.add_argument(
+            "--sleep", default="0.1", dest="sleep", type=float, help="Seconds to sleep between each iteration"
+        )
 
     def handle(self, *args, **options):
         """Handle method."""
@@ -45,6 +48,7 @@ class Command(LoggingBaseCommand):
                 self.logger.error("An error was generated rendomly")
             if warn_dice < options['warning_prob']:
                 self.logger.warning("A warning was generated randomly")
-            time.sleep(0.1)
+            if options['sleep']:
+                time.sleep(options['sleep'])
             if n % options['trace_steps'] == 0:
                 self.logger.info(f"{n}/{options['limit']}")
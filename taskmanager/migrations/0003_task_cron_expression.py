@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:50
+
+import taskmanager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0002_auto_20201001_1751'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='cron_expression',
+            field=models.CharField(blank=True, help_text="A cron expression, e.g. '*/15 8-20 * * mon-fri', evaluated in the time zone of the project; it overrides the repetition period and rate.", max_length=100, validators=[taskmanager.models.validate_cron_expression]),
+        ),
+    ]
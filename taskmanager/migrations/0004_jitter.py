@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0003_task_cron_expression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='jitter',
+            field=models.PositiveIntegerField(blank=True, help_text="Seconds within which the next rides are spread, to avoid starting many tasks at once; it overrides the category's one", null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='jitter',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds within which the next rides of the tasks are spread, to avoid starting them all at once', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:52
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0004_jitter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appcommand',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of tasks of this command running at once', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='max_concurrency',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of tasks of this category running at once', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:53
+
+import taskmanager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0005_max_concurrency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='lane',
+            field=models.CharField(blank=True, help_text="The lane of the spooler executing the task; it overrides the category's one", max_length=50, validators=[taskmanager.models.validate_spooler_lane]),
+        ),
+        migrations.AddField(
+            model_name='taskcategory',
+            name='lane',
+            field=models.CharField(blank=True, help_text='The lane of the spooler executing the tasks of this category', max_length=50, validators=[taskmanager.models.validate_spooler_lane]),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0006_lane'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='n_skipped_runs',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Skipped runs'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='overlap_policy',
+            field=models.CharField(choices=[('allow', 'ALLOW'), ('skip', 'SKIP'), ('queue', 'QUEUE ONE')], default='allow', help_text='What to do with runs starting while the task is still running: allow them, skip them, or queue one to start when the running one ends', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='overlap_queued',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
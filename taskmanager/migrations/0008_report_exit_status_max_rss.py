@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0007_overlap_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='exit_status',
+            field=models.IntegerField(blank=True, help_text='Exit code of the process executing the command, negative if killed by a signal.', null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='max_rss',
+            field=models.BigIntegerField(blank=True, help_text='Peak resident memory of the process executing the command, in bytes.', null=True, verbose_name='peak memory'),
+        ),
+    ]
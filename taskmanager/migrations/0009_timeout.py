@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0008_report_exit_status_max_rss'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds after which the running command is interrupted', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='invocation_result',
+            field=models.CharField(choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT')], default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='cached_last_invocation_result',
+            field=models.CharField(blank=True, choices=[('', '---'), ('ok', 'OK'), ('failed', 'FAILED'), ('errors', 'ERRORS'), ('warnings', 'WARNINGS'), ('timeout', 'TIMEOUT')], max_length=20, null=True, verbose_name='Last result'),
+        ),
+    ]
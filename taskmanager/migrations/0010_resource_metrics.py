@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0009_timeout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='cpu_system',
+            field=models.FloatField(blank=True, help_text='CPU time spent in system mode by the command, in seconds.', null=True, verbose_name='system CPU'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='cpu_user',
+            field=models.FloatField(blank=True, help_text='CPU time spent in user mode by the command, in seconds.', null=True, verbose_name='user CPU'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='duration',
+            field=models.FloatField(blank=True, help_text='Wall clock time of the run, in seconds.', null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='io_read_blocks',
+            field=models.BigIntegerField(blank=True, help_text='Number of blocks read from the filesystem by the command.', null=True, verbose_name='blocks read'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='io_write_blocks',
+            field=models.BigIntegerField(blank=True, help_text='Number of blocks written to the filesystem by the command.', null=True, verbose_name='blocks written'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='cached_last_invocation_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='Last duration'),
+        ),
+    ]
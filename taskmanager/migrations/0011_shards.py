@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:07
+
+import django.db.models.deletion
+import taskmanager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0010_resource_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='The report of the run of a sharded task, this shard is part of.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='taskmanager.report'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='shard_value',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='shard_argument',
+            field=models.CharField(blank=True, help_text='Argument taking the value of each shard, e.g. --region; the values are passed as positional arguments when not set', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='shard_values',
+            field=models.TextField(blank=True, help_text='Values of the shards, separated by commas, e.g. north, south or 1..20; when set, each run spools a parallel execution for each value', validators=[taskmanager.models.validate_shard_values]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0011_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='started',
+            field=models.BooleanField(default=True, help_text='Whether the run has started: shards are spooled before being started.'),
+        ),
+    ]
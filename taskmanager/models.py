@@ -1,21 +1,99 @@
 """Define Django models for the taskmanager app."""
 import calendar
+import collections
 import datetime
 import os
 import re
-from io import StringIO
-from typing import Dict
+import zlib
+from itertools import islice
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
 
 import pytz
-from django.core.management import load_command_class
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
 try:
     from django.utils.translation import ugettext_lazy as _
 except ImportError:
     from django.utils.translation import gettext_lazy as _
 from taskmanager import notifications
-from taskmanager.settings import UWSGI_TASKMANAGER_N_REPORTS_INLINE
-from taskmanager.tasks import exec_command_task
+from taskmanager.cron import get_cron_schedule
+from taskmanager.dispatcher import notify_dispatcher
+from taskmanager.execution import get_command_class, get_command_help
+from taskmanager.logfile import LogChunk, LogReader, remove_logfile
+from taskmanager.settings import (
+    UWSGI_TASKMANAGER_DISPATCHER,
+    UWSGI_TASKMANAGER_MAX_SHARDS,
+    UWSGI_TASKMANAGER_N_REPORTS_INLINE,
+    UWSGI_TASKMANAGER_SPOOLERS,
+)
+from taskmanager.tasks import spool_task
+
+
+def validate_cron_expression(value: str) -> None:
+    """Validate a cron expression, compiling it and checking it fires."""
+    try:
+        get_cron_schedule(value).next_fire(datetime.datetime.now(pytz.utc))
+    except ValueError as e:
+        raise ValidationError(
+            _("Invalid cron expression: %(error)s"), params={"error": e}
+        )
+
+
+def validate_spooler_lane(value: str) -> None:
+    """Validate the name of a lane, among the configured spoolers."""
+    if value and value not in UWSGI_TASKMANAGER_SPOOLERS:
+        raise ValidationError(
+            _("Unknown lane %(lane)s, configured ones are: %(lanes)s"),
+            params={"lane": value, "lanes": ", ".join(UWSGI_TASKMANAGER_SPOOLERS)},
+        )
+
+
+SHARD_RANGE_RE = re.compile(r"^(\d+)\.\.(\d+)$")
+
+
+def parse_shard_values(
+    value: str, max_shards: int = UWSGI_TASKMANAGER_MAX_SHARDS
+) -> List[str]:
+    """Return the values of the shards, separated by commas, `<first>..<last>` ranges.
+
+    The values of a range keep the width of the first one, if zero-padded:
+    e.g. `01..03` is `01, 02, 03`.
+
+    :param max_shards: the max number of shards, checked before expanding ranges
+    """
+    values: List[str] = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        match = SHARD_RANGE_RE.match(item)
+        if match:
+            first, last = match.groups()
+            width = len(first) if first.startswith("0") else 0
+            if int(first) > int(last):
+                raise ValueError(f"empty range {item}")
+            n_values = int(last) - int(first) + 1
+        else:
+            n_values = 1
+        if len(values) + n_values > max_shards:
+            raise ValueError(f"more than {max_shards} shards")
+        if match:
+            values.extend(f"{n:0{width}d}" for n in range(int(first), int(last) + 1))
+        else:
+            values.append(item)
+    return values
+
+
+def validate_shard_values(value: str) -> None:
+    """Validate the values of the shards, parsing them."""
+    try:
+        parse_shard_values(value)
+    except ValueError as e:
+        raise ValidationError(
+            _("Invalid shard values: %(error)s"), params={"error": e}
+        )
 
 
 class AppCommand(models.Model):
@@ -24,18 +102,21 @@ class AppCommand(models.Model):
     name = models.CharField(max_length=100)
     app_name = models.CharField(max_length=100)
     active = models.BooleanField(default=True)
+    max_concurrency = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        help_text=_("Maximum number of tasks of this command running at once"),
+    )
 
     def get_command_class(self):
-        """Get the command class."""
-        return load_command_class(app_name=self.app_name, name=self.name)
+        """Get a new instance of the command, whose class is cached in the process."""
+        return get_command_class(self.app_name, self.name)()
 
     @property
     def help_text(self):
         """Get the command help text."""
-        output = StringIO()
-        command_class = self.get_command_class()
-        command_class.create_parser("", self.name).print_help(file=output)
-        return output.getvalue()
+        return get_command_help(self.app_name, self.name)
 
     def __str__(self):
         """Return the string representation of the app command."""
@@ -48,6 +129,66 @@ class AppCommand(models.Model):
         verbose_name_plural = _("Commands")
 
 
+class ReportQuerySet(models.QuerySet):
+    """A queryset of reports."""
+
+    def purge(self, batch_size: int = 1000, removed_dirs: Collection[str] = ()) -> int:
+        """Delete the reports in batches, along with their logfiles.
+
+        :param: batch_size the number of reports deleted with each query
+        :param: removed_dirs the shard directories of logfiles that are going
+          to be removed as a whole, whose logfiles are not removed one by one
+
+        :return: the number of reports deleted
+        """
+        n_deleted = 0
+        while True:
+            batch = list(self.values_list("pk", "logfile")[:batch_size])
+            if not batch:
+                break
+            batch_ids = [pk for pk, logfile in batch]
+            children_logfiles = Report.objects.filter(
+                parent__in=batch_ids
+            ).values_list("logfile", flat=True)
+            for logfile in [logfile for pk, logfile in batch] + list(children_logfiles):
+                if (
+                    logfile
+                    and os.path.dirname(os.path.dirname(logfile)) not in removed_dirs
+                ):
+                    remove_logfile(logfile)
+            Report.objects.filter(pk__in=batch_ids).delete()
+            n_deleted += len(batch)
+        return n_deleted
+
+    def finished(self) -> "ReportQuerySet":
+        """Return the finished reports, excluding the shards of unfinished runs.
+
+        The reports of sharded runs are unfinished until all their shards are.
+        """
+        return self.exclude(invocation_result=Report.RESULT_NO).exclude(
+            parent__invocation_result=Report.RESULT_NO
+        )
+
+    def keep_last_n_per_task(self, n: int = UWSGI_TASKMANAGER_N_REPORTS_INLINE) -> int:
+        """Delete all the reports except the latest `n` of each task.
+
+        :return: the number of reports deleted
+        """
+        if not n:
+            return 0
+        purged_ids = []
+        n_reports: "collections.Counter[int]" = collections.Counter()
+        for pk, task_id in self.order_by("task_id", "-id").values_list(
+            "pk", "task_id"
+        ):
+            n_reports[task_id] += 1
+            if n_reports[task_id] > n:
+                purged_ids.append(pk)
+        if not purged_ids:
+            return 0
+        return Report.objects.filter(pk__in=purged_ids).purge()
+
+
 class Report(models.Model):
     """A report of a task execution with log."""
 
@@ -56,12 +197,21 @@ class Report(models.Model):
     RESULT_FAILED = "failed"
     RESULT_ERRORS = "errors"
     RESULT_WARNINGS = "warnings"
+    RESULT_TIMEOUT = "timeout"
+    RESULTS_BY_SEVERITY = (
+        RESULT_OK,
+        RESULT_WARNINGS,
+        RESULT_ERRORS,
+        RESULT_TIMEOUT,
+        RESULT_FAILED,
+    )
     RESULT_CHOICES = (
         (RESULT_NO, "---"),
         (RESULT_OK, "OK"),
         (RESULT_FAILED, "FAILED"),
         (RESULT_ERRORS, "ERRORS"),
         (RESULT_WARNINGS, "WARNINGS"),
+        (RESULT_TIMEOUT, "TIMEOUT"),
     )
 
     task = models.ForeignKey("Task", on_delete=models.CASCADE)
@@ -76,6 +226,66 @@ class Report(models.Model):
     n_log_lines = models.PositiveIntegerField(null=True, blank=True)
     n_log_errors = models.PositiveIntegerField(null=True, blank=True)
     n_log_warnings = models.PositiveIntegerField(null=True, blank=True)
+    exit_status = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "Exit code of the process executing the command, "
+            "negative if killed by a signal."
+        ),
+    )
+    max_rss = models.BigIntegerField(
+        _("peak memory"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "Peak resident memory of the process executing the command, in bytes."
+        ),
+    )
+    duration = models.FloatField(
+        null=True, blank=True, help_text=_("Wall clock time of the run, in seconds.")
+    )
+    cpu_user = models.FloatField(
+        _("user CPU"),
+        null=True,
+        blank=True,
+        help_text=_("CPU time spent in user mode by the command, in seconds."),
+    )
+    cpu_system = models.FloatField(
+        _("system CPU"),
+        null=True,
+        blank=True,
+        help_text=_("CPU time spent in system mode by the command, in seconds."),
+    )
+    io_read_blocks = models.BigIntegerField(
+        _("blocks read"),
+        null=True,
+        blank=True,
+        help_text=_("Number of blocks read from the filesystem by the command."),
+    )
+    io_write_blocks = models.BigIntegerField(
+        _("blocks written"),
+        null=True,
+        blank=True,
+        help_text=_("Number of blocks written to the filesystem by the command."),
+    )
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="shards",
+        help_text=_("The report of the run of a sharded task, this shard is part of."),
+    )
+    shard_value = models.CharField(max_length=255, blank=True)
+    started = models.BooleanField(
+        default=True,
+        help_text=_(
+            "Whether the run has started: shards are spooled before being started."
+        ),
+    )
+
+    objects = ReportQuerySet.as_manager()
 
     def __str__(self):
         """Return the string representation of the app command."""
@@ -84,34 +294,156 @@ class Report(models.Model):
             f" {self.invocation_datetime}"
         )
 
-    def get_log_lines(self):
-        # FIXME: iterate over the file instead of read all lines in memory
-        """Return log lines from logfile or log field."""
-        try:
-            log_lines = "".join(open(self.logfile, "r").readlines()).split("\n")
-        except FileNotFoundError:
-            log_lines = self.log.split("\n")
-        return log_lines
+    def aggregate_shards(self) -> bool:
+        """Sum up the counts of the shard reports, locking this report meanwhile.
+
+        Once all the shards are complete, the result is the worst one of them.
 
-    def read_log_lines(self, offset: int):
+        :return: True if all the shards have been completed since the last call
+        """
+        with transaction.atomic():
+            result = (
+                Report.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("invocation_result", flat=True)
+                .first()
+            )
+            if result:
+                # NOTE: aggregated already, once complete
+                return False
+            shards = list(self.shards.order_by("pk"))
+            for field in ("n_log_lines", "n_log_errors", "n_log_warnings"):
+                setattr(self, field, sum(getattr(s, field) or 0 for s in shards))
+            for field in ("cpu_user", "cpu_system"):
+                setattr(self, field, sum(getattr(s, field) or 0 for s in shards))
+            self.max_rss = max((s.max_rss or 0 for s in shards), default=None)
+            self.log = "\n".join(
+                f"{s.shard_value}: "
+                f"{s.invocation_result or ('running' if s.started else 'pending')}"
+                for s in shards
+            )
+            results = [s.invocation_result for s in shards]
+            complete = self.RESULT_NO not in results
+            if complete:
+                self.invocation_result = max(
+                    results, key=self.RESULTS_BY_SEVERITY.index, default=self.RESULT_OK
+                )
+                self.duration = (
+                    timezone.now() - self.invocation_datetime
+                ).total_seconds()
+            self.save()
+        return complete
+
+    def get_log_reader(self) -> LogReader:
+        """Return a reader of the report logfile."""
+        return LogReader(self.logfile)
+
+    def get_log_lines(
+        self, start: int = 0, count: Optional[int] = None, level: Optional[str] = None
+    ):
+        """Return log lines from logfile or log field.
+
+        :param: start the number of the first line to return
+        :param: count the number of lines to return, all lines if None
+        :param: level the level of the lines to return (e.g. `ERROR`), if any
+
+        Lines of the logfile are reached through its line index, and through
+        its level index if a level is given, so that only the requested lines
+        are read.
+        """
+        reader = self.get_log_reader()
+        if level and self.logfile and reader.has_level_index(level):
+            return reader.level_lines(level, start, count)
+        if level:
+            return list(
+                islice(
+                    (x for x in self.iter_log_lines() if level in x),
+                    start,
+                    None if count is None else start + count,
+                )
+            )
+        if self.logfile and reader.exists():
+            return reader.lines(start, count)
+        log_lines = self.log.split("\n")
+        return log_lines[start:] if count is None else log_lines[start:start + count]
+
+    def iter_log_lines(self) -> Iterator[str]:
+        """Iterate over log lines from logfile or log field."""
+        reader = self.get_log_reader()
+        if self.logfile and reader.exists():
+            return reader.iter_lines()
+        return iter(self.log.split("\n"))
+
+    def count_log_lines(self, level: Optional[str] = None) -> int:
+        """Return the number of log lines in logfile or log field.
+
+        :param: level the level of the lines to count (e.g. `ERROR`), if any
+        """
+        reader = self.get_log_reader()
+        if level and self.logfile and reader.has_level_index(level):
+            return reader.count_level_lines(level)
+        if level:
+            return sum(1 for x in self.iter_log_lines() if level in x)
+        if self.logfile and reader.exists():
+            return reader.count_lines()
+        return len(self.log.split("\n"))
+
+    def get_log_tail(self, count: int):
+        """Return the last `count` log lines from logfile or log field."""
+        reader = self.get_log_reader()
+        if self.logfile and reader.exists():
+            return reader.tail(count)
+        return self.log.split("\n")[-count:] if count else []
+
+    def read_log_lines(self, offset: int, grep: Optional[str] = None, level=None):
         """Uses an offset to read just lines of the log file not yet read.
 
         :param: offset parameter in bytes
+        :param: grep the terms to search in lines, separated by `|`
+        :param: level the level of the lines to read (e.g. `ERROR`)
 
         :return: 2-tuple (list, int)
           - list of lines of log files from offset
-          - the size of the file in bytes
+          - the offset in bytes to continue reading from
         """
-        if os.path.exists(self.logfile):
-            fh = open(self.logfile, "r")
-            fh.seek(offset)
-            log_lines = [line.strip('\n') for line in fh]
-            log_size = fh.tell()
-            fh.close()
-            return log_lines, log_size
+        chunk = self.read_log_chunk(offset, grep=grep, level=level)
+        if chunk:
+            return chunk.lines, chunk.offset
         else:
             return [], None
 
+    def read_log_chunk(
+        self,
+        offset: int,
+        grep: Optional[str] = None,
+        level=None,
+        max_bytes: Optional[int] = None,
+        max_lines: Optional[int] = None,
+    ) -> Optional[LogChunk]:
+        """Read a chunk of the log file from an offset, filtering its lines.
+
+        :param: offset parameter in bytes
+        :param: max_bytes the maximum size of the chunk in bytes
+        :param: max_lines the maximum number of lines read
+
+        While the report is not complete, a last line not yet terminated
+        is left to the next chunk, so that lines are never split.
+
+        :return: the chunk of the log, or None if there is no log file
+        """
+        reader = self.get_log_reader()
+        if self.logfile and reader.exists():
+            terms = grep.split("|") if grep else None
+            return reader.read_from(
+                offset,
+                terms=terms,
+                level=level,
+                max_bytes=max_bytes,
+                max_lines=max_lines,
+                hold_partial=not self.invocation_result,
+            )
+        return None
+
     def emit_notifications(self):
         """Emit a slack or email notification."""
         if not self.invocation_result:
@@ -128,6 +460,26 @@ class TaskCategory(models.Model):
     """A task category, used to group tasks when numbers go up."""
 
     name = models.CharField(max_length=255)
+    jitter = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text=_(
+            "Seconds within which the next rides of the tasks are spread, "
+            "to avoid starting them all at once"
+        ),
+    )
+    max_concurrency = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        help_text=_("Maximum number of tasks of this category running at once"),
+    )
+    lane = models.CharField(
+        max_length=50,
+        blank=True,
+        validators=[validate_spooler_lane],
+        help_text=_("The lane of the spooler executing the tasks of this category"),
+    )
 
     def __str__(self):
         """Return the string representation of the task category."""
@@ -140,6 +492,85 @@ class TaskCategory(models.Model):
         verbose_name_plural = _("Tasks categories")
 
 
+class TaskQuerySet(models.QuerySet):
+    """A queryset of tasks."""
+
+    def with_last_invocation_datetime(self) -> "TaskQuerySet":
+        """Annotate the tasks with the datetime of their last report.
+
+        `Task.last_invocation_datetime` uses the annotation, instead of
+        querying the last report of each task.
+        """
+        return self.annotate(
+            last_report_datetime=models.Max(
+                "report__invocation_datetime",
+                filter=models.Q(report__parent__isnull=True),
+            )
+        )
+
+    def iter_next_rides(
+        self, chunk_size: int = 2000
+    ) -> Iterator[Tuple["Task", Optional[datetime.datetime]]]:
+        """Yield the tasks along with their next ride, with a query per chunk.
+
+        Chunks are read in order of id, so that tasks can be updated meanwhile.
+        """
+        tasks = (
+            self.with_last_invocation_datetime()
+            .select_related("category")
+            .order_by("pk")
+        )
+        last_pk = None
+        while True:
+            chunk = tasks if last_pk is None else tasks.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            for task in chunk:
+                yield task, task.get_next_ride()
+            last_pk = chunk[-1].pk
+
+    def get_next_rides(self) -> Dict[int, Optional[datetime.datetime]]:
+        """Return the next rides of the tasks, by id."""
+        return {task.pk: next_ride for task, next_ride in self.iter_next_rides()}
+
+    def launch(self) -> int:
+        """Launch the tasks, persisting their state with a single update.
+
+        :return: the number of tasks launched
+        """
+        tasks = list(self.select_related("command", "category"))
+        self.model.bulk_launch(tasks)
+        return len(tasks)
+
+    def stop(self) -> int:
+        """Stop the tasks, persisting their state with a single update.
+
+        :return: the number of tasks stopped
+        """
+        tasks = list(self.select_related("category"))
+        self.model.bulk_stop(tasks)
+        return len(tasks)
+
+    def update_next_rides(self, batch_size: int = 2000) -> int:
+        """Compute the next rides of the tasks and update the changed ones in bulk.
+
+        :return: the number of tasks updated
+        """
+        changed = []
+        n_updated = 0
+        for task, next_ride in self.iter_next_rides(chunk_size=batch_size):
+            if task.cached_next_ride != next_ride:
+                task.cached_next_ride = next_ride
+                changed.append(task)
+            if len(changed) >= batch_size:
+                n_updated += self.model.objects.bulk_update(changed, ["cached_next_ride"])
+                changed = []
+        if changed:
+            n_updated += self.model.objects.bulk_update(changed, ["cached_next_ride"])
+        return n_updated
+
+
 class Task(models.Model):
     """
     A command related task.
@@ -159,6 +590,15 @@ class Task(models.Model):
         (REPETITION_PERIOD_MONTH, "MONTH"),
     )
 
+    OVERLAP_ALLOW = "allow"
+    OVERLAP_SKIP = "skip"
+    OVERLAP_QUEUE = "queue"
+    OVERLAP_POLICY_CHOICES = (
+        (OVERLAP_ALLOW, "ALLOW"),
+        (OVERLAP_SKIP, "SKIP"),
+        (OVERLAP_QUEUE, "QUEUE ONE"),
+    )
+
     STATUS_IDLE = "idle"
     STATUS_SPOOLED = "spooled"
     STATUS_SCHEDULED = "scheduled"
@@ -197,6 +637,16 @@ class Task(models.Model):
         max_length=20, choices=REPETITION_PERIOD_CHOICES, blank=True
     )
     repetition_rate = models.PositiveSmallIntegerField(blank=True, null=True)
+    cron_expression = models.CharField(
+        max_length=100,
+        blank=True,
+        validators=[validate_cron_expression],
+        help_text=_(
+            "A cron expression, e.g. '*/15 8-20 * * mon-fri', "
+            "evaluated in the time zone of the project; "
+            "it overrides the repetition period and rate."
+        ),
+    )
     spooler_id = models.FilePathField(
         path="/",
         match="uwsgi_spoolfile_on_*",
@@ -208,6 +658,59 @@ class Task(models.Model):
         blank=True, null=True, help_text=_("A note on how this task is used.")
     )
 
+    jitter = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text=_(
+            "Seconds within which the next rides are spread, "
+            "to avoid starting many tasks at once; it overrides the category's one"
+        ),
+    )
+    lane = models.CharField(
+        max_length=50,
+        blank=True,
+        validators=[validate_spooler_lane],
+        help_text=_(
+            "The lane of the spooler executing the task; "
+            "it overrides the category's one"
+        ),
+    )
+    overlap_policy = models.CharField(
+        max_length=20,
+        choices=OVERLAP_POLICY_CHOICES,
+        default=OVERLAP_ALLOW,
+        help_text=_(
+            "What to do with runs starting while the task is still running: "
+            "allow them, skip them, or queue one to start when the running one ends"
+        ),
+    )
+    overlap_queued = models.BooleanField(default=False, editable=False)
+    shard_argument = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text=_(
+            "Argument taking the value of each shard, e.g. --region; "
+            "the values are passed as positional arguments when not set"
+        ),
+    )
+    shard_values = models.TextField(
+        blank=True,
+        validators=[validate_shard_values],
+        help_text=_(
+            "Values of the shards, separated by commas, e.g. north, south or 1..20; "
+            "when set, each run spools a parallel execution for each value"
+        ),
+    )
+    timeout = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        help_text=_("Seconds after which the running command is interrupted"),
+    )
+    n_skipped_runs = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Skipped runs")
+    )
+
     cached_last_invocation_datetime = models.DateTimeField(
         blank=True, null=True, verbose_name=_("Last datetime")
     )
@@ -224,14 +727,23 @@ class Task(models.Model):
     cached_last_invocation_n_warnings = models.PositiveIntegerField(
         null=True, blank=True, verbose_name=_("Warnings")
     )
+    cached_last_invocation_duration = models.FloatField(
+        null=True, blank=True, verbose_name=_("Last duration")
+    )
     cached_next_ride = models.DateTimeField(
         blank=True, null=True, verbose_name=_("Next"),
     )
 
+    objects = TaskQuerySet.as_manager()
+
     @property
     def last_report(self):
         """Get the last report of the task."""
-        return self.report_set.order_by("invocation_datetime").last()
+        return (
+            self.report_set.filter(parent__isnull=True)
+            .order_by("invocation_datetime")
+            .last()
+        )
 
     @property
     def last_invocation_result(self):
@@ -241,13 +753,31 @@ class Task(models.Model):
     @property
     def last_invocation_datetime(self):
         """Get the last invocation date and time."""
+        if hasattr(self, "last_report_datetime"):
+            # NOTE: annotated by TaskQuerySet.with_last_invocation_datetime
+            return self.last_report_datetime
         return self.last_report.invocation_datetime if self.last_report else None
 
     def get_next_ride(self) -> datetime.datetime:
         """Get the next ride."""
         utc_tz = pytz.timezone('UTC')
-        if self.repetition_period and self.status in [self.STATUS_SPOOLED, self.STATUS_STARTED]:
+        if self.cron_expression and self.status in [
+            self.STATUS_SCHEDULED, self.STATUS_SPOOLED, self.STATUS_STARTED
+        ]:
+            jitter = self.get_jitter_offset()
+            try:
+                next_ride = jitter + get_cron_schedule(self.cron_expression).next_fire(
+                    datetime.datetime.now(utc_tz) - jitter,
+                    timezone.get_default_timezone(),
+                )
+            except ValueError:
+                # NOTE: the cron expression never fires (e.g. on February 30th)
+                next_ride = None
+        elif self.repetition_period and self.status in [self.STATUS_SPOOLED, self.STATUS_STARTED]:
             now = self.last_invocation_datetime or datetime.datetime.now().replace(tzinfo=utc_tz)
+            # next rides are computed as if not delayed by jitter, then delayed
+            jitter = self.get_jitter_offset()
+            now -= jitter
 
             if self.repetition_rate in (None, 0):
                 # consider 1 as default repetition_rate
@@ -303,8 +833,9 @@ class Task(models.Model):
                 next_ride = now + datetime.timedelta(seconds=10)
             else:
                 next_ride = _next
+            next_ride += jitter
         elif self.scheduling and self.status == Task.STATUS_SCHEDULED:
-            next_ride = self.scheduling
+            next_ride = self.scheduling + self.get_jitter_offset()
         else:
             next_ride = None
 
@@ -312,6 +843,45 @@ class Task(models.Model):
             next_ride = next_ride.replace(tzinfo=utc_tz)
         return next_ride
 
+    @property
+    def jitter_window(self) -> int:
+        """Get the seconds within which next rides are spread, or the category's."""
+        if self.jitter is not None:
+            return self.jitter
+        if self.category_id and self.category.jitter:
+            return self.category.jitter
+        return 0
+
+    def get_spooler(self) -> Optional[str]:
+        """Get the spooler directory of the lane of the task, or of its category.
+
+        :return: None for the default spooler
+        """
+        lane = self.lane or (self.category.lane if self.category_id else "")
+        return UWSGI_TASKMANAGER_SPOOLERS.get(lane) if lane else None
+
+    def get_shard_values(self) -> List[str]:
+        """Get the values of the shards of the task, empty if not sharded."""
+        return parse_shard_values(self.shard_values)
+
+    def get_shard_args(self, value: str) -> List[str]:
+        """Get the arguments of the command, for the shard of the given value."""
+        if self.shard_argument:
+            return self.complete_args + [self.shard_argument, value]
+        return self.complete_args + [value]
+
+    def get_jitter_offset(self) -> datetime.timedelta:
+        """Get the delay added to the next rides of the task.
+
+        The delay is within the jitter window, and derived from a hash of
+        the task id, so that it is stable across restarts.
+        """
+        window = self.jitter_window
+        if not window or not self.pk:
+            return datetime.timedelta(0)
+        seconds = zlib.crc32(str(self.pk).encode()) % (window + 1)
+        return datetime.timedelta(seconds=seconds)
+
     @property
     def _args_dict(self):
         res = {}
@@ -365,67 +935,131 @@ class Task(models.Model):
         return f"{self.name} ({self.status})"
 
     def delete(self, *args, **kwargs):
-        """Stop and delete the task itself."""
+        """Stop and delete the task itself, along with the logfiles of its reports."""
         self.stop()
+        self.report_set.all().purge()
         super().delete(*args, **kwargs)
 
     def stop(self):
         """Stop the task itself removing the scheduled spooler."""
-        if self.spooler_id:
-            spooler_path = self.spooler_id.encode()
-            try:
-                os.unlink(spooler_path)
-            except FileNotFoundError:
-                # TODO: launch warning about ghost spooler lost
-                pass
-        self.spooler_id = ""
-        self.status = self.STATUS_IDLE
-        self.keep_last_n_reports()
-        self.cached_next_ride = self.get_next_ride()
-        self.save(update_fields=("spooler_id", "status", "cached_next_ride"))
+        Task.bulk_stop([self])
 
     def launch(self):
         """Launch the task itself."""
-        if self.spooler_id:
-            # NOTE: spooler already scheduled
-            spooler_path = self.spooler_id.encode()
-            try:
-                os.unlink(spooler_path)
-            except FileNotFoundError:
-                # TODO: launch warning about ghost spooler lost
-                pass
-        self.status = self.STATUS_SPOOLED
-        self.save(update_fields=("status",))
-        kwargs = {}
-        if self.scheduling:
-            self.status = Task.STATUS_SCHEDULED
-            schedule = int(self.scheduling.timestamp())
-            # NOTE: spool at param requires bytes
-            kwargs["at"] = str(schedule).encode()
-
-        # Spool the execution of the command
-        task_id = exec_command_task.spool(self, **kwargs)
-        if task_id:
-            self.spooler_id = task_id.decode("utf-8")
-        else:
-            # This probably means the uWSGI spooler is unavailable and
-            # the task executed synchronously (e.g. during tests).
-            pass
+        Task.bulk_launch([self])
+
+    @staticmethod
+    def _unlink_spooler_files(tasks: List["Task"]) -> None:
+        """Remove the spooler files of the given tasks, if any."""
+        for task in tasks:
+            if task.spooler_id:
+                # NOTE: spooler already scheduled
+                spooler_path = task.spooler_id.encode()
+                try:
+                    os.unlink(spooler_path)
+                except FileNotFoundError:
+                    # TODO: launch warning about ghost spooler lost
+                    pass
 
-        self.cached_next_ride = self.get_next_ride()
-        self.save(update_fields=("spooler_id", "status", "cached_next_ride"))
+    @classmethod
+    def bulk_stop(cls, tasks: List["Task"]) -> None:
+        """Stop the given tasks, removing their spoolers, within one transaction."""
+        cls._unlink_spooler_files(tasks)
+        for task in tasks:
+            task.spooler_id = ""
+            task.status = cls.STATUS_IDLE
+            task.cached_next_ride = task.get_next_ride()
+        with transaction.atomic():
+            Report.objects.filter(
+                task__in=tasks, parent__isnull=True
+            ).keep_last_n_per_task()
+            cls.objects.bulk_update(tasks, ("spooler_id", "status", "cached_next_ride"))
+
+    @classmethod
+    def bulk_launch(cls, tasks: List["Task"]) -> None:
+        """Launch the given tasks, persisting their state in two bulk queries.
+
+        The tasks are persisted as spooled, or scheduled, with one `bulk_update`
+        before being spooled; their spooler files are recorded afterwards with one
+        conditional update, only for the tasks whose status has not been changed
+        meanwhile by the spooler workers.
+        """
+        cls._unlink_spooler_files(tasks)
+        # NOTE: the status of a running task is kept,
+        # the new run is subject to the overlap policy
+        running_ids = set(
+            cls.objects.filter(
+                pk__in=[task.pk for task in tasks], status=cls.STATUS_STARTED
+            ).values_list("pk", flat=True)
+        )
+        for task in tasks:
+            task.status = cls.STATUS_SPOOLED
+            if task.cron_expression or task.scheduling:
+                task.status = cls.STATUS_SCHEDULED
+            task.cached_next_ride = task.get_next_ride()
+            if task.status == cls.STATUS_SCHEDULED and not task.cached_next_ride:
+                # NOTE: the cron expression never fires
+                task.status = cls.STATUS_IDLE
+            task.spooler_id = ""
+        with transaction.atomic():
+            cls.objects.bulk_update(
+                [task for task in tasks if task.pk not in running_ids],
+                ("spooler_id", "status", "cached_next_ride"),
+            )
+
+        dispatched_ids = []
+        spooled_tasks = []
+        for task in tasks:
+            if task.status == cls.STATUS_IDLE:
+                continue
+            at = task.cached_next_ride if task.status == cls.STATUS_SCHEDULED else None
+            if task.pk in running_ids:
+                task.status = cls.STATUS_STARTED
+            status, next_ride = task.status, task.cached_next_ride
+            if at and UWSGI_TASKMANAGER_DISPATCHER:
+                # NOTE: the dispatcher spools the task when due
+                dispatched_ids.append(task.pk)
+                if task.pk not in running_ids:
+                    continue
+            else:
+                # Spool the execution of the command
+                task.spooler_id = spool_task(task, at=at)
+            spooled_tasks.append((task.pk, status, task.spooler_id, next_ride))
+        if spooled_tasks:
+            with transaction.atomic():
+                cls.objects.filter(pk__in=[pk for pk, *_ in spooled_tasks]).update(
+                    spooler_id=models.Case(
+                        *(
+                            models.When(
+                                pk=pk, status=status, then=models.Value(spooler_id)
+                            )
+                            for pk, status, spooler_id, _ in spooled_tasks
+                        ),
+                        default=models.F("spooler_id"),
+                        output_field=cls._meta.get_field("spooler_id"),
+                    ),
+                    cached_next_ride=models.Case(
+                        *(
+                            models.When(
+                                pk=pk, status=status, then=models.Value(next_ride)
+                            )
+                            for pk, status, _, next_ride in spooled_tasks
+                        ),
+                        default=models.F("cached_next_ride"),
+                        output_field=cls._meta.get_field("cached_next_ride"),
+                    ),
+                )
+        if dispatched_ids:
+            notify_dispatcher(dispatched_ids)
 
     def keep_last_n_reports(self, n: int = UWSGI_TASKMANAGER_N_REPORTS_INLINE):
-        """Delete all Task's Reports except latest `n` Reports."""
+        """Delete all Task's Reports except latest `n` Reports, with their logfiles."""
         if n:
-            last_n_reports_ids = (
-                Report.objects.filter(task=self)
-                .order_by("-id")[:n]
-                .values_list("id", flat=True)
+            reports = Report.objects.filter(task=self, parent__isnull=True)
+            last_n_reports_ids = reports.order_by("-id")[:n].values_list(
+                "id", flat=True
             )
-            Report.objects.filter(task=self).exclude(
-                pk__in=list(last_n_reports_ids)
-            ).delete()
+            reports.exclude(pk__in=list(last_n_reports_ids)).purge()
 
     class Meta:
         """Django model options."""
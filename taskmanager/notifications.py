@@ -29,6 +29,7 @@ invocation_result_to_level_map = {
     "warnings": LEVEL_WARNINGS,
     "errors": LEVEL_ERRORS,
     "failed": LEVEL_FAILED,
+    "timeout": LEVEL_FAILED,
 }
 
 
@@ -24,6 +24,30 @@ UWSGI_TASKMANAGER_SHOW_LOGVIEWER_LINK: bool = getattr(
     django_project_settings, "UWSGI_TASKMANAGER_SHOW_LOGVIEWER_LINK", True
 )
 
+UWSGI_TASKMANAGER_LOGVIEWER_PAGE_SIZE: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOGVIEWER_PAGE_SIZE", 1000
+)
+
+UWSGI_TASKMANAGER_LOGVIEWER_MAX_PAGE_SIZE: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOGVIEWER_MAX_PAGE_SIZE", 10000
+)
+
+UWSGI_TASKMANAGER_LOG_CHUNK_MAX_BYTES: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOG_CHUNK_MAX_BYTES", 1024 * 1024
+)
+
+UWSGI_TASKMANAGER_LOG_CHUNK_MAX_LINES: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOG_CHUNK_MAX_LINES", 10000
+)
+
+UWSGI_TASKMANAGER_LOG_STREAM_TIMEOUT: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOG_STREAM_TIMEOUT", 60
+)
+
+UWSGI_TASKMANAGER_LOG_STREAM_POLL_INTERVAL: float = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOG_STREAM_POLL_INTERVAL", 0.5
+)
+
 UWSGI_TASKMANAGER_USE_FILTER_COLLAPSE: bool = getattr(
     django_project_settings, "UWSGI_TASKMANAGER_USE_FILTER_COLLAPSE", True
 )
@@ -32,6 +56,84 @@ UWSGI_TASKMANAGER_SAVE_LOGFILE: bool = getattr(
     django_project_settings, "UWSGI_TASKMANAGER_SAVE_LOGFILE", True
 )
 
+UWSGI_TASKMANAGER_RETENTION_DAYS: Optional[int] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_RETENTION_DAYS", None
+)
+"""Reports older than this number of days are purged, with their logfiles."""
+
+UWSGI_TASKMANAGER_RETENTION_MAX_BYTES: Optional[int] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_RETENTION_MAX_BYTES", None
+)
+"""The oldest reports are purged until the logfiles take at most these bytes."""
+
+UWSGI_TASKMANAGER_COMPRESS_LOGFILE: bool = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_COMPRESS_LOGFILE", False
+)
+
+UWSGI_TASKMANAGER_LOGFILE_BLOCK_SIZE: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOGFILE_BLOCK_SIZE", 64 * 1024
+)
+
+UWSGI_TASKMANAGER_LOGFILE_FLUSH_INTERVAL: Optional[float] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOGFILE_FLUSH_INTERVAL", None
+)
+"""Seconds between flushes of buffered logfiles, None to flush every line."""
+
+UWSGI_TASKMANAGER_LOGFILE_BUFFER_SIZE: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_LOGFILE_BUFFER_SIZE", 64 * 1024
+)
+"""Size of the buffer of logfiles flushed every `LOGFILE_FLUSH_INTERVAL` seconds."""
+
+UWSGI_TASKMANAGER_DISPATCHER: bool = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_DISPATCHER", False
+)
+"""Spool scheduled tasks from the dispatcher when due, instead of with `at`."""
+
+UWSGI_TASKMANAGER_DISPATCHER_MULE: Optional[int] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_DISPATCHER_MULE", None
+)
+"""The uWSGI mule running the dispatcher, None to run it with `run_dispatcher`."""
+
+UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_DISPATCHER_RESYNC_INTERVAL", 60
+)
+"""Seconds between reloads of the dispatcher heap from the DB."""
+
+UWSGI_TASKMANAGER_CONCURRENCY_RETRY_DELAY: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_CONCURRENCY_RETRY_DELAY", 30
+)
+"""Seconds after which tasks over the concurrency cap are spooled again."""
+
+UWSGI_TASKMANAGER_MAX_SHARDS: int = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_MAX_SHARDS", 1000
+)
+"""The max number of shards of a sharded task, each spooled at every run."""
+
+UWSGI_TASKMANAGER_SPOOLERS: Dict[str, str] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_SPOOLERS", {}
+)
+"""The spooler directories of the lanes of tasks, by lane name."""
+
+UWSGI_TASKMANAGER_EXECUTION_MODE: str = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_EXECUTION_MODE", "inline"
+)
+"""Where commands are executed: "inline" in the spooler, "fork" in a child process."""
+
+UWSGI_TASKMANAGER_RLIMIT_AS: Optional[int] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_RLIMIT_AS", None
+)
+"""The max address space of the forked commands, in bytes."""
+
+UWSGI_TASKMANAGER_RLIMIT_CPU: Optional[int] = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_RLIMIT_CPU", None
+)
+"""The max CPU time of the forked commands, in seconds."""
+
+UWSGI_TASKMANAGER_PRELOAD_COMMANDS: bool = getattr(
+    django_project_settings, "UWSGI_TASKMANAGER_PRELOAD_COMMANDS", False
+)
+"""Import the active commands in the spooler processes, as soon as they start."""
+
 UWSGI_TASKMANAGER_NOTIFICATION_HANDLERS: Dict[str, Dict[str, Any]] = getattr(
     django_project_settings, "UWSGI_TASKMANAGER_NOTIFICATION_HANDLERS", {}
 )
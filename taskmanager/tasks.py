@@ -1,158 +1,535 @@
 """Define uWSGI exec command tasks for the taskmanager app."""
 
 import datetime
+import logging
 import os
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Optional, Union
 
-from django.conf import settings
 from django.core.management import call_command
-from file_read_backwards import FileReadBackwards
+from django.db import models, transaction
 
+from taskmanager.dispatcher import notify_dispatcher
+from taskmanager.execution import (
+    EXECUTION_MODE_FORK,
+    CommandTimeout,
+    Watchdog,
+    get_resource_usage,
+    run_command_forked,
+)
+from taskmanager.logfile import ReportLogWriter, compress_logfile, remove_logfile
 from taskmanager.settings import (
+    UWSGI_TASKMANAGER_COMPRESS_LOGFILE,
+    UWSGI_TASKMANAGER_CONCURRENCY_RETRY_DELAY,
+    UWSGI_TASKMANAGER_DISPATCHER,
+    UWSGI_TASKMANAGER_EXECUTION_MODE,
+    UWSGI_TASKMANAGER_LOGFILE_BLOCK_SIZE,
+    UWSGI_TASKMANAGER_LOGFILE_BUFFER_SIZE,
+    UWSGI_TASKMANAGER_LOGFILE_FLUSH_INTERVAL,
     UWSGI_TASKMANAGER_N_LINES_IN_REPORT_LOG,
+    UWSGI_TASKMANAGER_RLIMIT_AS,
+    UWSGI_TASKMANAGER_RLIMIT_CPU,
     UWSGI_TASKMANAGER_SAVE_LOGFILE,
 )
+from taskmanager.utils import get_report_logfile_path
 from taskmanager.uwsgidecorators_wrapper import spool
 
 if TYPE_CHECKING:
-    from taskmanager.models import Task
+    from taskmanager.models import Report, Task
+
+
+# NOTE: bump when the arguments spooled by `spool_task` change
+SPOOL_PAYLOAD_VERSION = 3
+
+logger = logging.getLogger(__name__)
 
 
 @spool(pass_arguments=True)
-def exec_command_task(curr_task: "Task"):
-    """Execute the command of a Task."""
-    from taskmanager.models import Report, Task
+def exec_command_task(
+    task_id: Union[int, "Task"],
+    payload_version: int = SPOOL_PAYLOAD_VERSION,
+    fire_at: Optional[int] = None,
+    shard_report_id: Optional[int] = None,
+):
+    """Execute the command of a Task, loading its current state by its id.
+
+    Spooler files written by later versions, whose arguments are unknown,
+    are dropped, as are the ones spooled at a time that is no longer
+    the next ride of the Task (e.g. re-scheduled or stopped meanwhile).
 
-    curr_task.status = Task.STATUS_STARTED
-    curr_task.save(update_fields=("status",))
+    The shards of a sharded Task are executed subject to the concurrency caps,
+    as the Task, which is left started until the last shard completes.
+
+    :param task_id: the id of the Task; Task instances, pickled as a whole in
+      the spooler files of earlier versions, are accepted too
+    :param payload_version: the version of the spooled arguments
+    :param fire_at: the timestamp the Task was spooled to be executed at, if any
+    :param shard_report_id: the id of the report of the shard to execute,
+      if the execution is a shard of a sharded Task
+    """
+    from taskmanager.models import Task
+
+    # NOTE: the arguments missing in the payloads of earlier versions default
+    # to their former behavior, the ones of later versions are unknown
+    if payload_version > SPOOL_PAYLOAD_VERSION:
+        logger.warning(
+            f"Spooled execution of task {task_id} dropped: "
+            f"payload version {payload_version} > {SPOOL_PAYLOAD_VERSION}"
+        )
+        return
+    if isinstance(task_id, Task):
+        task_id = task_id.pk
+    curr_task = (
+        Task.objects.select_related("command", "category").filter(pk=task_id).first()
+    )
+    if curr_task is None:
+        # NOTE: the task has been deleted after being spooled
+        return
+    if shard_report_id:
+        start = start_task(curr_task, shard_report_id)
+        if start == START_CAPPED:
+            respool_task(
+                curr_task, UWSGI_TASKMANAGER_CONCURRENCY_RETRY_DELAY, shard_report_id
+            )
+        elif start == START_OK:
+            exec_shard(curr_task, shard_report_id)
+        return
+    if fire_at is not None and (
+        curr_task.cached_next_ride is None
+        or abs(curr_task.cached_next_ride.timestamp() - fire_at) >= 1
+    ):
+        logger.info(
+            f"Stale spooled execution of task {task_id} at {fire_at} dropped: "
+            f"next ride is {curr_task.cached_next_ride}"
+        )
+        return
+
+    try:
+        shard_values = curr_task.get_shard_values()
+    except ValueError as e:
+        # NOTE: e.g. more shards than allowed, set before the max was lowered
+        logger.error(f"Execution of task {task_id} dropped: {e}")
+        return
+
+    start = start_task(curr_task)
+    if start == START_CAPPED:
+        # NOTE: too many tasks of the same category or command are running
+        respool_task(curr_task, UWSGI_TASKMANAGER_CONCURRENCY_RETRY_DELAY)
+    if start != START_OK:
+        return
+
+    if shard_values:
+        # NOTE: the last shard to complete finishes the run
+        fan_out_shards(curr_task, shard_values)
+    else:
+        finish_task(curr_task, run_command(curr_task, curr_task.complete_args))
+
+
+def finish_task(curr_task: "Task", report_obj: "Report") -> None:
+    """Cache the last invocation of a Task, and re-schedule it if needed.
+
+    :param report_obj: the report of the run, complete
+    """
+    from taskmanager.models import Task
+
+    curr_task.cached_last_invocation_datetime = report_obj.invocation_datetime
+    curr_task.cached_last_invocation_result = report_obj.invocation_result
+    curr_task.cached_last_invocation_n_errors = report_obj.n_log_errors
+    curr_task.cached_last_invocation_n_warnings = report_obj.n_log_warnings
+    curr_task.cached_last_invocation_duration = report_obj.duration
+
+    # Re-schedule the Task if needed
+    spool, spool_at = False, None
+    if Task.objects.filter(pk=curr_task.pk, overlap_queued=True).update(
+        overlap_queued=False
+    ):
+        # NOTE: a run was queued while running, it replaces the next ride
+        curr_task.status = Task.STATUS_SPOOLED
+        curr_task.cached_next_ride = datetime.datetime.now(datetime.timezone.utc)
+        spool = True
+    elif (
+        curr_task.repetition_period or curr_task.cron_expression
+    ) and curr_task.get_next_ride():
+
+        # compute next_ride
+        next_ride = curr_task.get_next_ride()
+
+        # NOTE: the dispatcher spools the task when due, otherwise
+        # the file in the spooler is re-written, with correct schedule
+        spool, spool_at = not UWSGI_TASKMANAGER_DISPATCHER, next_ride
+
+        # set status and cached_next_ride
+        curr_task.status = Task.STATUS_SPOOLED
+        curr_task.cached_next_ride = next_ride
+    else:
+        curr_task.status = Task.STATUS_IDLE
+        if curr_task.spooler_id:
+            # NOTE: spooler already scheduled
+            spooler_path = curr_task.spooler_id.encode()
+            try:
+                os.unlink(spooler_path)
+            except FileNotFoundError:
+                # TODO: launch warning about ghost spooler lost
+                pass
+        curr_task.cached_next_ride = None
+    curr_task.spooler_id = ""
+    # NOTE: the Task is persisted before being spooled, so that a spooler
+    # executing it at once finds its next ride
+    curr_task.save(
+        update_fields=[
+            "cached_last_invocation_datetime",
+            "cached_last_invocation_result",
+            "cached_last_invocation_n_errors",
+            "cached_last_invocation_n_warnings",
+            "cached_last_invocation_duration",
+            "status",
+            "repetition_rate",
+            "spooler_id",
+            "cached_next_ride",
+        ]
+    )
+    if spool:
+        record_spooler_id(curr_task, spool_task(curr_task, at=spool_at))
+    elif UWSGI_TASKMANAGER_DISPATCHER and curr_task.cached_next_ride:
+        notify_dispatcher([curr_task.pk])
+    curr_task.keep_last_n_reports()
+
+    # Finally, emit notifications
+    try:
+        report_obj.emit_notifications()
+    except Exception:
+        pass
+
+
+def run_command(
+    task: "Task", args: List[str], report_obj: Optional["Report"] = None
+) -> "Report":
+    """Execute the command of a Task, writing its output into the report logfile.
+
+    :param args: the arguments of the command
+    :param report_obj: the report of the execution, created if not given
+    :return: the report of the execution, with its result
+    """
+    from taskmanager.models import Report
 
     # Set-up execution
     now = datetime.datetime.now()
-    report_logfile_path = (
-        f"{settings.MEDIA_ROOT}/taskmanager/logs/"
-        f"task_{curr_task.id}/{now:%Y%m%d%H%M%S%f}.log"
+    report_logfile_path = get_report_logfile_path(
+        task.id, now, suffix=str(report_obj.pk) if report_obj else ""
     )
     os.makedirs(os.path.dirname(report_logfile_path), exist_ok=True)
     Path(report_logfile_path).touch()
-    n_log_errors = 0
-    n_log_warnings = 0
-    n_log_lines = 0
-    n_tail_lines = UWSGI_TASKMANAGER_N_LINES_IN_REPORT_LOG
-    log_tail_lines = []
     result = Report.RESULT_OK
 
-    report_obj = Report.objects.create(task=curr_task, logfile=report_logfile_path,)
+    if report_obj:
+        report_obj.logfile = report_logfile_path
+        report_obj.save(update_fields=("logfile",))
+    else:
+        report_obj = Report.objects.create(task=task, logfile=report_logfile_path)
 
-    # open logfile for writing, with line buffering turned on (1)
-    report_logfile = open(report_logfile_path, "w", buffering=1)
+    # open logfile for writing, counting lines, errors and warnings while writing
+    report_logfile = ReportLogWriter(
+        report_logfile_path,
+        n_tail_lines=UWSGI_TASKMANAGER_N_LINES_IN_REPORT_LOG,
+        flush_interval=UWSGI_TASKMANAGER_LOGFILE_FLUSH_INTERVAL,
+        buffer_size=UWSGI_TASKMANAGER_LOGFILE_BUFFER_SIZE,
+    )
+    arguments = " ".join(args)
 
-    # Execute the command and capture its output
+    # Execute the command and capture its output, measuring the resources used
+    started = time.monotonic()
+    usage_before = get_resource_usage()
+    forked = None
     try:
         report_logfile.write(
             (
-                f"Started: {curr_task.command.name} {curr_task.arguments}"
+                f"Started: {task.command.name} {arguments}"
                 f" @ {datetime.datetime.now()}\n"
             )
         )
         report_logfile.flush()
 
-        call_command(
-            curr_task.command.name, *curr_task.complete_args, stdout=report_logfile
-        )
+        command = task.command.get_command_class()
+        if UWSGI_TASKMANAGER_EXECUTION_MODE == EXECUTION_MODE_FORK:
+            forked = run_command_forked(
+                command,
+                args,
+                stdout=report_logfile,
+                max_memory=UWSGI_TASKMANAGER_RLIMIT_AS,
+                max_cpu=UWSGI_TASKMANAGER_RLIMIT_CPU,
+                timeout=task.timeout,
+            )
+            report_obj.exit_status = forked.exit_status
+            if forked.timed_out:
+                raise CommandTimeout
+            elif forked.exit_status:
+                result = Report.RESULT_FAILED
+                if forked.exit_status < 0:
+                    report_logfile.write(f"\nKILLED by signal {-forked.exit_status}")
+        else:
+            with Watchdog(task.timeout):
+                call_command(command, *args, stdout=report_logfile)
 
+        report_logfile.flush()
+    except CommandTimeout:
+        result = Report.RESULT_TIMEOUT
+        report_logfile.write(f"\nTIMEOUT after {task.timeout} seconds")
         report_logfile.flush()
     except Exception as e:
         result = Report.RESULT_FAILED
         report_logfile.write(f"EXCEPTION raised: {e}")
         report_logfile.flush()
     finally:
+        report_obj.duration = time.monotonic() - started
+        if forked:
+            usage = forked.usage
+        else:
+            # NOTE: the peak memory is the one of the spooler process
+            usage = get_resource_usage(since=usage_before)
+        for field, value in usage.items():
+            setattr(report_obj, field, value)
         report_logfile.write(
             (
-                f"\nFinished: {curr_task.command.name} {curr_task.arguments}"
+                f"\nFinished: {task.command.name} {arguments}"
                 f" @ {datetime.datetime.now()}"
             )
         )
         report_logfile.close()
 
-    with FileReadBackwards(report_logfile_path, encoding="utf-8") as report_logfile:
-        for line in report_logfile:
-            if n_log_lines < n_tail_lines:
-                log_tail_lines.append(line)
-            n_log_lines += 1
-            if "ERROR" in line:
-                n_log_errors += 1
-            elif "WARNING" in line:
-                n_log_warnings += 1
-
-    hidden_lines = n_log_lines - n_tail_lines
-    if hidden_lines > 0:
-        log_tail_lines.append(f"{hidden_lines} lines hidden ...")
     if result == Report.RESULT_OK:
-        if n_log_warnings:
+        if report_logfile.n_warnings:
             result = Report.RESULT_WARNINGS
-        if n_log_errors:
+        if report_logfile.n_errors:
             result = Report.RESULT_ERRORS
     if not UWSGI_TASKMANAGER_SAVE_LOGFILE:
+        remove_logfile(report_logfile_path)
+    elif UWSGI_TASKMANAGER_COMPRESS_LOGFILE:
         try:
-            os.unlink(report_logfile_path)
-        except FileNotFoundError:
+            compress_logfile(
+                report_logfile_path, block_size=UWSGI_TASKMANAGER_LOGFILE_BLOCK_SIZE
+            )
+        except OSError:
+            # NOTE: the plain logfile is kept
             pass
 
     report_obj.invocation_result = result
-    report_obj.log = "\n".join(log_tail_lines[::-1])
-    report_obj.n_log_lines = n_log_lines
-    report_obj.n_log_errors = n_log_errors
-    report_obj.n_log_warnings = n_log_warnings
+    report_obj.log = report_logfile.log_tail
+    report_obj.n_log_lines = report_logfile.n_lines
+    report_obj.n_log_errors = report_logfile.n_errors
+    report_obj.n_log_warnings = report_logfile.n_warnings
     report_obj.save()
+    return report_obj
 
-    curr_task.cached_last_invocation_result = report_obj.invocation_result
-    curr_task.cached_last_invocation_n_errors = report_obj.n_log_errors
-    curr_task.cached_last_invocation_n_warnings = report_obj.n_log_warnings
-    curr_task.cached_last_invocation_datetime = report_obj.invocation_datetime
 
-    # Re-schedule the Task if needed
-    if curr_task.repetition_period and curr_task.get_next_ride():
+def fan_out_shards(task: "Task", shard_values: List[str]) -> "Report":
+    """Spool an execution of a sharded Task for each shard, executed in parallel.
 
-        # compute next_ride
-        next_ride = curr_task.get_next_ride()
+    :return: the report of the run, parent of the reports of the shards
+    """
+    from taskmanager.models import Report, Task
 
-        # re-write file in the spooler, with correct schedule
-        schedule = str(int(next_ride.timestamp())).encode()
-        task_id = exec_command_task.spool(curr_task, at=schedule)
+    with transaction.atomic():
+        report_obj = Report.objects.create(task=task)
+        shard_reports = Report.objects.bulk_create(
+            [
+                Report(task=task, parent=report_obj, shard_value=value, started=False)
+                for value in shard_values
+            ]
+        )
+    if not all(shard_report.pk for shard_report in shard_reports):
+        # NOTE: the ids are not returned by bulk_create on some DB backends
+        shard_reports = list(report_obj.shards.order_by("pk"))
+    report_obj.aggregate_shards()
+    Task.objects.filter(pk=task.pk).update(
+        cached_last_invocation_datetime=report_obj.invocation_datetime
+    )
+    for shard_report in shard_reports:
+        spool_task(task, shard_report_id=shard_report.pk)
+    report_obj.refresh_from_db()
+    return report_obj
 
-        # set status, spooler_id and cached_next_ride
-        curr_task.status = Task.STATUS_SPOOLED
-        curr_task.spooler_id = task_id.decode("utf-8")
-        curr_task.cached_next_ride = next_ride
-    else:
-        curr_task.status = Task.STATUS_IDLE
-        if curr_task.spooler_id:
-            # NOTE: spooler already scheduled
-            spooler_path = curr_task.spooler_id.encode()
-            try:
-                os.unlink(spooler_path)
-            except FileNotFoundError:
-                # TODO: launch warning about ghost spooler lost
-                pass
-        curr_task.spooler_id = ""
-        curr_task.cached_next_ride = None
-    curr_task.keep_last_n_reports()
-    curr_task.save(
-        update_fields=(
-            "cached_last_invocation_result",
-            "cached_last_invocation_n_errors",
-            "cached_last_invocation_n_warnings",
-            "cached_last_invocation_datetime",
-            "status",
-            "repetition_rate",
-            "spooler_id",
-            "cached_next_ride",
+
+def exec_shard(task: "Task", shard_report_id: int) -> None:
+    """Execute a shard of a sharded Task, aggregating its report into the parent one.
+
+    Once the last shard completes, the run of the Task is finished.
+    """
+    from taskmanager.models import Report
+
+    shard_report = (
+        Report.objects.select_related("parent").filter(pk=shard_report_id).first()
+    )
+    if shard_report is None:
+        # NOTE: the report has been purged
+        return
+    run_command(task, task.get_shard_args(shard_report.shard_value), shard_report)
+    report_obj = shard_report.parent
+    if report_obj.aggregate_shards():
+        finish_task(task, report_obj)
+
+
+def spool_task(
+    task: "Task",
+    at: Optional[datetime.datetime] = None,
+    shard_report_id: Optional[int] = None,
+) -> str:
+    """Spool the execution of a Task, at the given time if any.
+
+    The Task is spooled in the spooler of its lane, if any.
+    Only its id is spooled, so that the Task is executed with its current state,
+    along with the id of the report of the shard to execute, if any.
+
+    :return: the path of the spooler file, if the uWSGI spooler is available
+    """
+    kwargs = {}
+    spooler = task.get_spooler()
+    if spooler:
+        kwargs["spooler"] = spooler.encode()
+    fire_at = None
+    if at:
+        fire_at = int(at.timestamp())
+        # NOTE: spool at param requires bytes
+        kwargs["at"] = str(fire_at).encode()
+    spooler_id = exec_command_task.spool(
+        task.pk, SPOOL_PAYLOAD_VERSION, fire_at, shard_report_id, **kwargs
+    )
+    if spooler_id:
+        return spooler_id.decode("utf-8")
+    # This probably means the uWSGI spooler is unavailable and
+    # the task executed synchronously (e.g. during tests):
+    # the state left by the execution is loaded.
+    task.refresh_from_db()
+    return ""
+
+
+START_OK = "started"
+START_CAPPED = "capped"
+START_SKIPPED = "skipped"
+START_QUEUED = "queued"
+
+
+def start_task(task: "Task", shard_report_id: Optional[int] = None) -> str:
+    """Set a Task as started, unless already running or at the concurrency caps.
+
+    When the Task is already running, its overlap policy applies: the run is
+    either allowed, skipped (and counted), or queued to start as soon as the
+    running one ends, unless another one is queued already.
+    The row of the Task is locked while its status is checked.
+
+    The rows of the command and of the category are locked while the running
+    executions are counted, so that executions of tasks sharing them are started
+    one at a time, as with a semaphore. The running executions are the ones of
+    the started tasks, and the ones of the started shards of the sharded tasks.
+
+    :param shard_report_id: the id of the report of a shard of the running Task,
+      to set the shard as started instead, unless started already
+    :return: `START_OK` if the task has been started, otherwise the reason why not
+    """
+    from taskmanager.models import AppCommand, Report, Task, TaskCategory
+
+    with transaction.atomic():
+        if shard_report_id:
+            shard_report = (
+                Report.objects.select_for_update()
+                .filter(pk=shard_report_id, started=False)
+                .first()
+            )
+            if shard_report is None:
+                # NOTE: the report has been purged, or the shard already started
+                return START_SKIPPED
+        elif task.overlap_policy != Task.OVERLAP_ALLOW:
+            status = (
+                Task.objects.select_for_update()
+                .filter(pk=task.pk)
+                .values_list("status", flat=True)
+                .first()
+            )
+            if status == Task.STATUS_STARTED:
+                task_row = Task.objects.filter(pk=task.pk)
+                if task.overlap_policy == Task.OVERLAP_QUEUE:
+                    if task_row.filter(overlap_queued=False).update(
+                        overlap_queued=True
+                    ):
+                        return START_QUEUED
+                task_row.update(n_skipped_runs=models.F("n_skipped_runs") + 1)
+                return START_SKIPPED
+        # NOTE: sharded tasks run their shards, counted instead of the tasks;
+        # the Task is counted too when already running, as overlapping runs are
+        running_tasks = Task.objects.filter(
+            status=Task.STATUS_STARTED, shard_values=""
         )
+        running_shards = Report.objects.filter(
+            parent__isnull=False,
+            started=True,
+            invocation_result=Report.RESULT_NO,
+            task__status=Task.STATUS_STARTED,
+        )
+        command = (
+            AppCommand.objects.select_for_update()
+            .filter(pk=task.command_id, max_concurrency__isnull=False)
+            .first()
+        )
+        if command and (
+            running_tasks.filter(command=command).count()
+            + running_shards.filter(task__command=command).count()
+            >= command.max_concurrency
+        ):
+            return START_CAPPED
+        category = (
+            TaskCategory.objects.select_for_update()
+            .filter(pk=task.category_id, max_concurrency__isnull=False)
+            .first()
+        )
+        if category and (
+            running_tasks.filter(category=category).count()
+            + running_shards.filter(task__category=category).count()
+            >= category.max_concurrency
+        ):
+            return START_CAPPED
+        if shard_report_id:
+            Report.objects.filter(pk=shard_report_id).update(started=True)
+            return START_OK
+        Task.objects.filter(pk=task.pk).update(status=Task.STATUS_STARTED)
+    task.status = Task.STATUS_STARTED
+    return START_OK
+
+
+def respool_task(
+    task: "Task", delay: int, shard_report_id: Optional[int] = None
+) -> None:
+    """Spool a Task again, or one of its shards, to be executed in `delay` seconds."""
+    from taskmanager.models import Task
+
+    at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=delay
     )
+    if shard_report_id:
+        # NOTE: the Task is left running, the dispatcher only spools whole runs
+        spool_task(task, at=at, shard_report_id=shard_report_id)
+        return
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.STATUS_SPOOLED, spooler_id="", cached_next_ride=at
+    )
+    task.status, task.spooler_id, task.cached_next_ride = Task.STATUS_SPOOLED, "", at
+    if UWSGI_TASKMANAGER_DISPATCHER:
+        # NOTE: the dispatcher spools the task when due
+        notify_dispatcher([task.pk])
+    else:
+        record_spooler_id(task, spool_task(task, at=at))
 
-    # Finally, emit notifications
-    try:
-        report_obj.emit_notifications()
-    except Exception as e:
-        pass
+
+def record_spooler_id(task: "Task", spooler_id: str) -> None:
+    """Record the spooler file of a Task, persisted as spooled before spooling it.
+
+    The spooler file is recorded only if the status and the next ride of the Task
+    have not been changed meanwhile, e.g. by a spooler worker executing it.
+    """
+    from taskmanager.models import Task
+
+    if spooler_id:
+        Task.objects.filter(
+            pk=task.pk,
+            status=Task.STATUS_SPOOLED,
+            cached_next_ride=task.cached_next_ride,
+        ).update(spooler_id=spooler_id)
@@ -1,8 +1,11 @@
 """Define utils for the taskmanager app."""
+import datetime
+import os
 import re
 from typing import Optional
 
 from django.apps import apps
+from django.conf import settings
 
 from taskmanager.settings import UWSGI_TASKMANAGER_BASE_URL
 
@@ -44,3 +47,29 @@ def get_base_url() -> Optional[str]:
             tmp = re.sub(r".+://", "", UWSGI_TASKMANAGER_BASE_URL)
 
     return tmp
+
+
+def get_logs_root() -> str:
+    """Return the directory of the report logfiles."""
+    return os.path.join(settings.MEDIA_ROOT, "taskmanager", "logs")
+
+
+def get_logs_shard_dir(date: datetime.date) -> str:
+    """Return the directory of the report logfiles of a day."""
+    return os.path.join(get_logs_root(), f"{date:%Y}", f"{date:%m}", f"{date:%d}")
+
+
+def get_report_logfile_path(
+    task_id: int, now: datetime.datetime, suffix: str = ""
+) -> str:
+    """
+    Return the path of the logfile of a task execution started at `now`.
+
+    Logfiles are sharded by date, `<logs root>/<YYYY>/<MM>/<DD>/task_<id>/`,
+    so that expired logfiles are removed a whole day directory at a time.
+    The suffix tells apart the logfiles of executions started at once.
+    """
+    name = f"{now:%Y%m%d%H%M%S%f}_{suffix}" if suffix else f"{now:%Y%m%d%H%M%S%f}"
+    return os.path.join(
+        get_logs_shard_dir(now.date()), f"task_{task_id}", f"{name}.log"
+    )
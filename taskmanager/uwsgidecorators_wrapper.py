@@ -7,10 +7,15 @@ Copyright 2016-2019 Lars van de Kerkhof
 """
 
 
+# spooler arguments routing the spooled file, meaningless when executing synchronously
+ROUTING_SPOOLER_ARGS = ("spooler", "priority")
+
+
 class BaseDecorator(object):
-    @property
-    def spool(self):
-        return self.f
+    def spool(self, *args, **kwargs):
+        for key in ROUTING_SPOOLER_ARGS:
+            kwargs.pop(key, None)
+        return self.f(*args, **kwargs)
 
     def __init__(self, f):
         self.f = f
@@ -79,5 +84,11 @@ except ModuleNotFoundError as e:
         class timer(BaseDecoratorWithArguments):
             pass
 
+        class mule(BaseDecoratorWithArguments):
+            pass
+
+        class postfork(BaseDecorator):
+            pass
+
     else:
         raise e
@@ -1,23 +1,84 @@
 """Define Django views for the taskmanager app."""
-from django.http import JsonResponse
+import json
+import time
+from urllib.parse import urlencode
+
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 try:
     from django.utils.translation import ugettext_lazy as _
 except ImportError:
     from django.utils.translation import gettext_lazy as _
 
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
+
+from taskmanager.models import Report, Task
+from taskmanager.settings import (
+    UWSGI_TASKMANAGER_LOGVIEWER_MAX_PAGE_SIZE,
+    UWSGI_TASKMANAGER_LOGVIEWER_PAGE_SIZE,
+    UWSGI_TASKMANAGER_LOG_CHUNK_MAX_BYTES,
+    UWSGI_TASKMANAGER_LOG_CHUNK_MAX_LINES,
+    UWSGI_TASKMANAGER_LOG_STREAM_POLL_INTERVAL,
+    UWSGI_TASKMANAGER_LOG_STREAM_TIMEOUT,
+)
+
+
+def get_chunk_limits(request):
+    """Return the limits of log chunks set by `max_bytes` and `max_lines` parameters.
 
-from taskmanager.models import Report
+    The limits can only be lowered, from the ones set in the settings.
+    """
+    limits = {}
+    for param, max_value in (
+        ("max_bytes", UWSGI_TASKMANAGER_LOG_CHUNK_MAX_BYTES),
+        ("max_lines", UWSGI_TASKMANAGER_LOG_CHUNK_MAX_LINES),
+    ):
+        try:
+            value = int(request.GET.get(param, max_value))
+        except ValueError:
+            value = max_value
+        limits[param] = min(value, max_value) if max_value else value
+    return limits
 
 
 class LogViewerView(TemplateView):
-    """A template view to view the full report log."""
+    """A template view to view the report log, a range of lines at a time.
+
+    The range of lines is set with the `start` and `count` parameters,
+    or with the `tail` parameter, to view the last lines of the log.
+    """
 
     template_name = "log_viewer.html"
 
     @staticmethod
-    def get_report_lines(report):
-        return report.get_log_lines()
+    def get_report_lines(report, log_level="all", start=0, count=None):
+        """Return `count` lines of the report log, at the given level, from `start`."""
+        level = None if log_level == "all" else log_level.upper()
+        return report.get_log_lines(start, count, level=level)
+
+    def get_lines_range(self, n_lines):
+        """Return the range of lines requested, as a 2-tuple (start, count)."""
+        page_size = UWSGI_TASKMANAGER_LOGVIEWER_PAGE_SIZE
+        try:
+            tail = int(self.request.GET["tail"])
+        except (KeyError, ValueError):
+            tail = None
+        try:
+            count = int(self.request.GET.get("count", page_size))
+        except ValueError:
+            count = page_size
+        count = min(max(tail or count, 1), UWSGI_TASKMANAGER_LOGVIEWER_MAX_PAGE_SIZE)
+        if tail:
+            start = max(n_lines - count, 0)
+        else:
+            try:
+                start = max(int(self.request.GET.get("start", 0)), 0)
+            except ValueError:
+                start = 0
+        return start, count
+
+    def get_page_url(self, log_level, **params):
+        """Return the url of a page of the log viewer."""
+        return "?" + urlencode(dict(log_level=log_level, **params))
 
     def get_context_data(self, **kwargs):
         """Return the context data for the view."""
@@ -30,18 +91,32 @@ class LogViewerView(TemplateView):
         except Report.DoesNotExist:
             log = _("No log for the report {pk}.").format(pk=pk)
         else:
-            log_lines = self.get_report_lines(report)
-            context["log_error"] = {
-                "lines": (x for x in log_lines if "ERROR" in x),
-                "n": report.n_log_errors,
-            }
-            context["log_warning"] = {
-                "lines": (x for x in log_lines if "WARNING" in x),
-                "n": report.n_log_warnings,
-            }
-            context["log_all"] = {"lines": log_lines, "n": report.n_log_lines}
+            context["log_error"] = {"n": report.n_log_errors}
+            context["log_warning"] = {"n": report.n_log_warnings}
+            context["log_all"] = {"n": report.n_log_lines}
             if log_level in levels or log_level == "all":
-                log = "\n".join(context["log_" + log_level]["lines"])
+                n_lines = report.count_log_lines(
+                    None if log_level == "all" else log_level.upper()
+                )
+                start, count = self.get_lines_range(n_lines)
+                log = "\n".join(
+                    self.get_report_lines(report, log_level, start, count)
+                )
+                context["start"] = start
+                context["end"] = min(start + count, n_lines)
+                context["n_lines"] = n_lines
+                if start > 0:
+                    context["first_url"] = self.get_page_url(
+                        log_level, start=0, count=count
+                    )
+                    context["prev_url"] = self.get_page_url(
+                        log_level, start=max(start - count, 0), count=count
+                    )
+                if start + count < n_lines:
+                    context["next_url"] = self.get_page_url(
+                        log_level, start=start + count, count=count
+                    )
+                    context["last_url"] = self.get_page_url(log_level, tail=count)
             else:
                 log = _("The available levels are: ERROR or WARNING")
         context["log_txt"] = log
@@ -72,14 +147,32 @@ class LiveLogViewerView(TemplateView):
         return context
 
 
-class AjaxReadLogLines(LogViewerView):
+class AjaxReadLogLines(TemplateView):
     """Read log lines starting from an offset, as JsonResponse
     New log size and task status are included in the response.
+
+    The `line` parameter can be used instead of `offset`,
+    to start reading from a given line number.
+
+    Lines are filtered by the `level` (e.g. `ERROR`) and `grep` parameters,
+    where `grep` may hold alternative terms, separated by `|`.
+    The counters of lines read at each level are included in the response,
+    to be summed up by the client as the offset advances.
+
+    Each response reads at most `max_bytes` bytes or `max_lines` lines of the log:
+    `log_size` is the byte offset to continue reading from, and `eof` is false
+    when more lines are already available.
     """
 
     def render_to_response(self, context, **response_kwargs):
         pk = context.get("pk", None)
         offset = int(self.request.GET.get('offset', 0))
+        line = self.request.GET.get('line', None)
+        level = self.request.GET.get('level', '').upper() or None
+        grep = self.request.GET.get('grep', None)
+        level_counts = {}
+        n_lines_read = 0
+        eof = True
         try:
             report = Report.objects.get(pk=pk)
             task_status = report.task.status
@@ -88,10 +181,130 @@ class AjaxReadLogLines(LogViewerView):
             task_status = None
             log_size = 0
         else:
-            log_lines, log_size = report.read_log_lines(offset)
+            if line is not None:
+                # seek the line through the line index of the logfile
+                offset = report.get_log_reader().line_offset(int(line))
+            chunk = report.read_log_chunk(
+                offset, grep=grep, level=level, **get_chunk_limits(self.request)
+            )
+            if chunk:
+                log_lines, log_size = chunk.lines, chunk.offset
+                level_counts, n_lines_read = chunk.level_counts, chunk.n_lines
+                eof = chunk.eof
+            else:
+                log_lines, log_size = [], None
 
         return JsonResponse({
             'new_log_lines': log_lines,
             'task_status': task_status,
-            'log_size': log_size
+            'log_size': log_size,
+            'level_counts': level_counts,
+            'n_lines_read': n_lines_read,
+            'eof': eof,
         })
+
+
+class StreamLogLines(View):
+    """Stream log lines as they are appended to the logfile, as Server-Sent Events.
+
+    Each event holds the same data of the `AjaxReadLogLines` response,
+    with the offset to continue reading from as the event id,
+    so that a reconnecting `EventSource` resumes from the last event received.
+
+    The logfile size is checked every `UWSGI_TASKMANAGER_LOG_STREAM_POLL_INTERVAL`
+    seconds, and lines are read only when it grows. The stream ends with an
+    `end` event once the report is complete, and is closed anyway after
+    `UWSGI_TASKMANAGER_LOG_STREAM_TIMEOUT` seconds, not to hold a worker forever:
+    the `EventSource` then reconnects by itself.
+    """
+
+    heartbeat_interval = 15
+    status_interval = 5
+
+    def get(self, request, *args, **kwargs):
+        """Return the streaming response of the events."""
+        pk = kwargs.get("pk", None)
+        try:
+            report = Report.objects.select_related("task").get(pk=pk)
+        except Report.DoesNotExist:
+            raise Http404(_("No log for the report {pk}.").format(pk=pk))
+        offset = int(
+            request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("offset", 0)
+        )
+        level = request.GET.get("level", "").upper() or None
+        grep = request.GET.get("grep", None)
+        response = StreamingHttpResponse(
+            self.events(report, offset, level, grep, get_chunk_limits(request)),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def event(data, event=None, event_id=None) -> str:
+        """Return a Server-Sent Event."""
+        lines = []
+        if event:
+            lines.append(f"event: {event}")
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"data: {json.dumps(data)}")
+        return "\n".join(lines) + "\n\n"
+
+    def events(self, report, offset, level, grep, limits):
+        """Yield events while the logfile grows, until the report is complete."""
+        reader = report.get_log_reader()
+        now = time.monotonic()
+        deadline = now + UWSGI_TASKMANAGER_LOG_STREAM_TIMEOUT
+        last_event = last_status_check = now
+        task_status = report.task.status
+        complete = bool(report.invocation_result)
+        # the size of the logfile up to which all lines have been read
+        read_size = offset
+        yield "retry: 3000\n\n"
+        while True:
+            size = reader.size()
+            if size > read_size:
+                chunk = report.read_log_chunk(offset, grep=grep, level=level, **limits)
+                offset = chunk.offset
+                if chunk.eof:
+                    read_size = size
+                if chunk.n_lines:
+                    last_event = time.monotonic()
+                    yield self.event(
+                        {
+                            "new_log_lines": chunk.lines,
+                            "task_status": task_status,
+                            "log_size": offset,
+                            "level_counts": chunk.level_counts,
+                            "n_lines_read": chunk.n_lines,
+                            "eof": chunk.eof,
+                        },
+                        event_id=offset,
+                    )
+                    continue
+            if complete:
+                yield self.event({"task_status": task_status}, event="end")
+                return
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now - last_status_check >= self.status_interval:
+                # the report is complete once its result is set, then the
+                # logfile is read one last time before ending the stream
+                last_status_check = now
+                report.refresh_from_db(fields=["invocation_result"])
+                complete = bool(report.invocation_result)
+                if complete:
+                    read_size = offset
+                task_status = (
+                    Task.objects.filter(pk=report.task_id)
+                    .values_list("status", flat=True)
+                    .first()
+                )
+                continue
+            if now - last_event >= self.heartbeat_interval:
+                last_event = now
+                yield ": heartbeat\n\n"
+            time.sleep(UWSGI_TASKMANAGER_LOG_STREAM_POLL_INTERVAL)
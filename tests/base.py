@@ -0,0 +1,26 @@
+"""Define the base test cases of the taskmanager tests."""
+
+from django.test import TestCase
+
+from taskmanager.models import AppCommand, Task
+
+
+class TaskTestCase(TestCase):
+    """A base test case, preparing a task of the `check` command.
+
+    The task is created with the `task_fields`, unless they are None.
+    """
+
+    task_fields = {}
+
+    def setUp(self):
+        """Prepare the `check` command and a task executing it."""
+        self.command, _ = AppCommand.objects.get_or_create(
+            name="check", app_name="django.core"
+        )
+        if self.task_fields is not None:
+            self.task = self.create_task(**self.task_fields)
+
+    def create_task(self, name="task", **fields):
+        """Create a task of the `check` command."""
+        return Task.objects.create(name=name, command=self.command, **fields)
@@ -1,11 +1,21 @@
 """Define taskmanager commands tests."""
 
+import datetime
+import os
+import shutil
+import tempfile
 from io import StringIO
+from unittest import mock
 
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from taskmanager.models import AppCommand
+from taskmanager.logfile import ReportLogWriter
+from taskmanager.models import AppCommand, Report, Task
+from taskmanager.utils import get_logs_shard_dir, get_report_logfile_path
+
+from .base import TaskTestCase
 
 
 class CollectTaskCommandTest(TestCase):
@@ -29,3 +39,175 @@ class CollectTaskCommandTest(TestCase):
         out = StringIO()
         call_command("collectcommands", stdout=out)
         self.assertNotEqual(AppCommand.objects.all().count(), 0)
+
+
+class PurgeReportsCommandTest(TaskTestCase):
+    """A set of tests for the purge reports command."""
+
+    def setUp(self):
+        """Prepare reports of a task, some with logfiles in an old day directory."""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        super().setUp()
+        self.old_dir = get_logs_shard_dir(
+            datetime.date.today() - datetime.timedelta(days=40)
+        )
+        self.logfiles = []
+        for n in range(5):
+            old = n < 2
+            now = datetime.datetime.now() - datetime.timedelta(days=40 if old else 0)
+            logfile = get_report_logfile_path(self.task.id, now)
+            os.makedirs(os.path.dirname(logfile), exist_ok=True)
+            with ReportLogWriter(logfile) as writer:
+                writer.write("x" * 100)
+            self.logfiles.append(logfile)
+            report = Report.objects.create(
+                task=self.task, logfile=logfile, invocation_result=Report.RESULT_OK
+            )
+            if old:
+                Report.objects.filter(pk=report.pk).update(
+                    invocation_datetime=timezone.now() - datetime.timedelta(days=40)
+                )
+
+    def tearDown(self):
+        """Remove the logfiles left."""
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def purge(self, *args):
+        """Call the command with the given arguments."""
+        call_command("purge_reports", "--max-reports=0", *args, stdout=StringIO())
+
+    def test_age(self):
+        """Test old reports are purged, removing their day directory."""
+        self.purge("--days=30")
+        self.assertEqual(Report.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.old_dir))
+        self.assertTrue(all(os.path.exists(f) for f in self.logfiles[2:]))
+
+    def test_age_unfinished(self):
+        """Test old reports still running are not purged, nor their day directory."""
+        running, finished = Report.objects.order_by("pk")[:2]
+        Report.objects.filter(pk=running.pk).update(invocation_result=Report.RESULT_NO)
+        task = self.create_task("sharded task", shard_values="1..2")
+        parent = Report.objects.create(task=task)
+        Report.objects.bulk_create(
+            [
+                Report(task=task, parent=parent, shard_value="1", invocation_result="ok"),
+                Report(task=task, parent=parent, shard_value="2"),
+            ]
+        )
+        Report.objects.filter(task=task).update(
+            invocation_datetime=timezone.now() - datetime.timedelta(days=40)
+        )
+        self.purge("--days=30")
+        self.assertTrue(Report.objects.filter(pk=running.pk).exists())
+        self.assertFalse(Report.objects.filter(pk=finished.pk).exists())
+        self.assertEqual(Report.objects.filter(task=task).count(), 3)
+        self.assertEqual(
+            [os.path.exists(f) for f in self.logfiles], [True, False] + [True] * 3
+        )
+
+    def test_count(self):
+        """Test only the last reports of a task are kept."""
+        self.purge("--max-reports=2")
+        self.assertEqual(
+            [os.path.exists(f) for f in self.logfiles], [False] * 3 + [True] * 2
+        )
+        self.assertEqual(Report.objects.filter(task=self.task).count(), 2)
+
+    def test_count_shards(self):
+        """Test the reports of shards are kept with their parent, and not counted."""
+        task = self.create_task("sharded task", shard_values="1..8")
+        parent = Report.objects.create(task=task)
+        Report.objects.bulk_create(
+            [
+                Report(task=task, parent=parent, shard_value=value)
+                for value in task.get_shard_values()
+            ]
+        )
+        self.purge("--max-reports=5")
+        self.assertEqual(Report.objects.filter(task=task).count(), 9)
+        self.assertEqual(Report.objects.filter(task=self.task).count(), 5)
+
+    def test_size(self):
+        """Test the oldest reports are purged to keep logfiles within a budget."""
+        self.purge("--max-bytes=350")
+        self.assertEqual(Report.objects.count(), 3)
+        self.assertEqual(
+            [os.path.exists(f) for f in self.logfiles], [False] * 2 + [True] * 3
+        )
+
+    def test_size_unfinished(self):
+        """Test the oldest reports still running are not purged to keep the budget."""
+        running = Report.objects.order_by("pk").first()
+        Report.objects.filter(pk=running.pk).update(invocation_result=Report.RESULT_NO)
+        self.purge("--max-bytes=350")
+        self.assertEqual(
+            [os.path.exists(f) for f in self.logfiles], [True, False, False, True, True]
+        )
+
+    def test_dry_run(self):
+        """Test nothing is purged in dry run mode."""
+        self.purge("--days=30", "--max-reports=1", "--dry-run")
+        self.assertEqual(Report.objects.count(), 5)
+        self.assertTrue(all(os.path.exists(f) for f in self.logfiles))
+
+
+class RestartDespooledTasksCommandTest(TaskTestCase):
+    """A set of tests for the restart despooled tasks command."""
+
+    task_fields = None
+
+    def setUp(self):
+        """Prepare tasks in a spooler directory, some missing their spooler file."""
+        super().setUp()
+        self.spooler_dir = tempfile.mkdtemp()
+        self.tasks = {}
+        for name, status, spooled in (
+            ("kept", Task.STATUS_SPOOLED, True),
+            ("despooled", Task.STATUS_SPOOLED, False),
+            ("stuck", Task.STATUS_STARTED, False),
+        ):
+            spooler_id = os.path.join(self.spooler_dir, f"uwsgi_spoolfile_{name}")
+            if spooled:
+                open(spooler_id, "w").close()
+            self.tasks[name] = self.create_task(
+                name, status=status, spooler_id=spooler_id
+            )
+
+    def tearDown(self):
+        """Remove the spooler directory."""
+        shutil.rmtree(self.spooler_dir)
+
+    def restart(self, *args):
+        """Call the command with the given arguments, returning the relaunched."""
+        with mock.patch(
+            "taskmanager.models.spool_task", return_value="/spool/new"
+        ) as spool:
+            call_command("restart_despooled_tasks", *args, stdout=StringIO())
+        return {call.args[0].name for call in spool.call_args_list}
+
+    def test_spooled(self):
+        """Test only the spooled tasks missing the spooler file are relaunched."""
+        self.assertSetEqual(self.restart(), {"despooled"})
+        task = Task.objects.get(name="despooled")
+        self.assertEqual(task.spooler_id, "/spool/new")
+        self.assertEqual(task.status, Task.STATUS_SPOOLED)
+        self.assertEqual(Task.objects.get(name="stuck").status, Task.STATUS_STARTED)
+
+    def test_statuses(self):
+        """Test the tasks stuck in the given statuses are relaunched."""
+        self.assertSetEqual(
+            self.restart("--statuses=spooled,started"), {"despooled", "stuck"}
+        )
+        self.assertEqual(Task.objects.get(name="stuck").status, Task.STATUS_SPOOLED)
+
+    def test_dry_run(self):
+        """Test nothing is relaunched in dry run mode."""
+        self.assertSetEqual(self.restart("--dry-run"), set())
+        self.assertEqual(
+            Task.objects.get(name="despooled").spooler_id,
+            self.tasks["despooled"].spooler_id,
+        )
@@ -0,0 +1,137 @@
+"""Define taskmanager cron schedules tests."""
+
+import datetime
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from taskmanager.cron import UTC, CronSchedule
+from taskmanager.models import Task
+from taskmanager.tasks import exec_command_task
+
+from .base import TaskTestCase
+
+
+class TestCronSchedule(TestCase):
+    """A set of tests for cron schedules."""
+
+    def next_fires(self, expression, after, n=3):
+        """Return the next `n` fire times of an expression."""
+        schedule = CronSchedule(expression)
+        fires = []
+        for _ in range(n):
+            after = schedule.next_fire(after)
+            fires.append(after)
+        return fires
+
+    def test_next_fire(self):
+        """Test fire times are found across hours, days and weekends."""
+        friday = datetime.datetime(2022, 10, 14, 20, 40, tzinfo=UTC)
+        self.assertEqual(
+            self.next_fires("*/15 8-20 * * mon-fri", friday),
+            [
+                datetime.datetime(2022, 10, 14, 20, 45, tzinfo=UTC),
+                datetime.datetime(2022, 10, 17, 8, 0, tzinfo=UTC),
+                datetime.datetime(2022, 10, 17, 8, 15, tzinfo=UTC),
+            ],
+        )
+        self.assertEqual(
+            self.next_fires("@yearly", friday, n=1),
+            [datetime.datetime(2023, 1, 1, tzinfo=UTC)],
+        )
+        self.assertEqual(
+            self.next_fires("0 0 29 feb *", friday, n=1),
+            [datetime.datetime(2024, 2, 29, tzinfo=UTC)],
+        )
+
+    def test_days_of_month_or_week(self):
+        """Test restricted days of month and of week are alternative."""
+        self.assertEqual(
+            self.next_fires("0 12 1 * sun", datetime.datetime(2022, 10, 14, tzinfo=UTC)),
+            [
+                datetime.datetime(2022, 10, 16, 12, tzinfo=UTC),
+                datetime.datetime(2022, 10, 23, 12, tzinfo=UTC),
+                datetime.datetime(2022, 10, 30, 12, tzinfo=UTC),
+            ],
+        )
+        self.assertEqual(
+            self.next_fires("0 12 1 * 7", datetime.datetime(2022, 10, 30, 13, tzinfo=UTC))[0],
+            datetime.datetime(2022, 11, 1, 12, tzinfo=UTC),
+        )
+
+    def test_time_zone(self):
+        """Test the schedule is evaluated in the given time zone."""
+        rome = datetime.timezone(datetime.timedelta(hours=2))
+        self.assertEqual(
+            CronSchedule("0 9 * * *").next_fire(
+                datetime.datetime(2022, 10, 14, 8, tzinfo=UTC), rome
+            ),
+            datetime.datetime(2022, 10, 15, 7, tzinfo=UTC),
+        )
+
+    def test_invalid(self):
+        """Test invalid expressions are rejected."""
+        for expression in ("* * * *", "60 * * * *", "* * * * mon-xyz", "*/0 * * * *"):
+            with self.assertRaises(ValueError):
+                CronSchedule(expression)
+        with self.assertRaises(ValueError):
+            CronSchedule("0 0 31 feb *").next_fire(datetime.datetime.now(UTC))
+
+
+class TestCronTask(TaskTestCase):
+    """A set of tests for tasks scheduled with a cron expression."""
+
+    task_fields = {"name": "cron task", "cron_expression": "*/15 * * * *"}
+
+    def test_validation(self):
+        """Test the cron expression is validated."""
+        self.task.cron_expression = "every 15 minutes"
+        with self.assertRaises(ValidationError):
+            self.task.full_clean()
+        self.task.cron_expression = "0 0 30 2 *"
+        with self.assertRaises(ValidationError):
+            self.task.full_clean()
+
+    def test_never_fires(self):
+        """Test a task whose cron expression never fires is left idle, once launched."""
+        Task.objects.filter(pk=self.task.pk).update(cron_expression="0 0 30 2 *")
+        self.task.refresh_from_db()
+        with mock.patch("taskmanager.models.spool_task") as spool:
+            self.task.launch()
+        spool.assert_not_called()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertIsNone(self.task.cached_next_ride)
+        # spooled before the expression has been changed
+        Task.objects.filter(pk=self.task.pk).update(status=Task.STATUS_SPOOLED)
+        exec_command_task(self.task)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertEqual(self.task.last_report.invocation_result, "ok")
+
+    def test_next_ride(self):
+        """Test the next ride follows the cron expression, once launched."""
+        self.assertIsNone(self.task.get_next_ride())
+        self.task.status = Task.STATUS_SPOOLED
+        next_ride = self.task.get_next_ride()
+        self.assertEqual(next_ride.minute % 15, 0)
+        self.assertEqual(next_ride.second, 0)
+        self.assertLessEqual(
+            next_ride - datetime.datetime.now(UTC), datetime.timedelta(minutes=15)
+        )
+
+    def test_exec_reschedule(self):
+        """Test the task is spooled again at its next cron ride, once executed.
+
+        The task is left spooled, with the time of the next ride cached,
+        and its run is reported.
+        """
+        with mock.patch("taskmanager.tasks.spool_task", return_value="") as spool:
+            exec_command_task(self.task)
+        next_ride = spool.call_args.kwargs["at"]
+        self.assertEqual(next_ride.minute % 15, 0)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_SPOOLED)
+        self.assertEqual(self.task.cached_next_ride, next_ride)
+        self.assertEqual(self.task.last_report.invocation_result, "ok")
@@ -0,0 +1,59 @@
+"""Define taskmanager dispatcher tests."""
+
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from taskmanager.dispatcher import Dispatcher
+from taskmanager.models import AppCommand, Task
+
+
+class TestDispatcher(TestCase):
+    """A set of tests for the dispatcher of scheduled tasks."""
+
+    def setUp(self):
+        """Prepare tasks waiting for the dispatcher, due at different times."""
+        command, _ = AppCommand.objects.get_or_create(
+            name="test_command", app_name="taskmanager"
+        )
+        self.now = timezone.now()
+        self.tasks = [
+            Task.objects.create(
+                name=f"task {n}",
+                command=command,
+                status=Task.STATUS_SCHEDULED,
+                scheduling=self.now + datetime.timedelta(minutes=n),
+                cached_next_ride=self.now + datetime.timedelta(minutes=n),
+            )
+            for n in (-1, 0, 10)
+        ]
+        Task.objects.create(name="idle task", command=command)
+        self.dispatcher = Dispatcher()
+        self.dispatcher.load()
+
+    def test_load(self):
+        """Test the heap holds the waiting tasks, the earliest first."""
+        self.assertEqual(len(self.dispatcher.heap), 3)
+        self.assertEqual(self.dispatcher.heap[0][1], self.tasks[0].pk)
+
+    def test_dispatch_due(self):
+        """Test only the tasks due are spooled."""
+        self.assertEqual(self.dispatcher.dispatch_due(self.now.timestamp()), 2)
+        self.assertEqual(
+            [task.report_set.count() for task in self.tasks], [1, 1, 0]
+        )
+        self.assertEqual(len(self.dispatcher.heap), 1)
+
+    def test_stale_entries(self):
+        """Test stopped and re-scheduled tasks are skipped, and pushed again."""
+        self.tasks[0].stop()
+        Task.objects.filter(pk=self.tasks[1].pk).update(
+            cached_next_ride=self.now + datetime.timedelta(minutes=5)
+        )
+        self.assertEqual(self.dispatcher.dispatch_due(self.now.timestamp()), 0)
+        self.dispatcher.update([self.tasks[0].pk, self.tasks[1].pk])
+        self.assertEqual(len(self.dispatcher.heap), 2)
+        later = self.now + datetime.timedelta(minutes=5)
+        self.assertEqual(self.dispatcher.dispatch_due(later.timestamp()), 1)
+        self.assertEqual(self.tasks[1].report_set.count(), 1)
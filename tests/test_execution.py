@@ -0,0 +1,263 @@
+"""Define taskmanager execution tests."""
+
+import resource
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django import db
+from django.test import TestCase
+
+from taskmanager.execution import (
+    CommandTimeout,
+    Watchdog,
+    get_command_class,
+    preload_commands,
+    run_command_forked,
+)
+from taskmanager.models import AppCommand, Report, Task
+from taskmanager.tasks import exec_command_task
+
+from .base import TaskTestCase
+
+
+def fork_sleep():
+    """Fork a process sleeping, holding the file descriptors of this one."""
+    pid = os.fork()
+    if pid == 0:
+        time.sleep(10)
+        os._exit(0)
+    return pid
+
+
+class TestForkedExecution(TaskTestCase):
+    """A set of tests for commands executed in forked child processes."""
+
+    def test_output(self):
+        """Test the output of the child is streamed, with its exit status."""
+        out = StringIO()
+        result = run_command_forked("check", [], stdout=out)
+        self.assertEqual(result.exit_status, 0)
+        self.assertGreater(result.usage["max_rss"], 0)
+        self.assertIn("System check identified", out.getvalue())
+
+    def test_exception(self):
+        """Test an exception raised by the command is logged, failing the child."""
+        out = StringIO()
+        result = run_command_forked("not_a_command", [], stdout=out)
+        self.assertEqual(result.exit_status, 1)
+        self.assertIn("EXCEPTION raised: Unknown command", out.getvalue())
+
+    def test_process_output(self):
+        """Test the output written to the file descriptors of the child is streamed."""
+
+        def write_output(*args, stdout, **kwargs):
+            print("printed")
+            sys.stderr.write("to stderr\n")
+            os.write(2, b"to fd 2\n")
+            subprocess.run(["echo", "from a subprocess"], check=True)
+
+        out = StringIO()
+        with mock.patch("taskmanager.execution.call_command", write_output):
+            result = run_command_forked("check", [], stdout=out)
+        self.assertEqual(result.exit_status, 0)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            ["printed", "to stderr", "to fd 2", "from a subprocess"],
+        )
+
+    def test_pipe_held_open(self):
+        """Test the output is read until the child exits, not until the pipe is closed."""
+
+        def start_sleep(*args, stdout, **kwargs):
+            stdout.write(f"{fork_sleep()}\n")
+
+        out = StringIO()
+        started = time.monotonic()
+        with mock.patch("taskmanager.execution.call_command", start_sleep):
+            result = run_command_forked("check", [], stdout=out)
+        os.kill(int(out.getvalue()), signal.SIGKILL)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(result.exit_status, 0)
+
+    def test_resource_limits(self):
+        """Test the resource limits are set in the child only."""
+
+        def write_limits(*args, stdout, **kwargs):
+            for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU):
+                stdout.write(f"{resource.getrlimit(limit)}\n")
+
+        out = StringIO()
+        with mock.patch("taskmanager.execution.call_command", write_limits):
+            run_command_forked(
+                "check", [], stdout=out, max_memory=2 ** 32, max_cpu=60
+            )
+        self.assertEqual(out.getvalue(), f"{(2 ** 32, 2 ** 32)}\n(60, 61)\n")
+        self.assertNotEqual(resource.getrlimit(resource.RLIMIT_CPU), (60, 61))
+
+    def test_connections(self):
+        """Test the child does not use the connections of the parent."""
+
+        def write_connection(*args, stdout, **kwargs):
+            stdout.write(f"{db.connection.connection}\n")
+
+        db.connection.ensure_connection()
+        out = StringIO()
+        with mock.patch("taskmanager.execution.call_command", write_connection):
+            run_command_forked("check", [], stdout=out)
+        self.assertEqual(out.getvalue(), "None\n")
+        self.assertIsNotNone(db.connection.connection)
+
+    def test_exec_command_task(self):
+        """Test the exit status and peak memory of the child are reported."""
+        with mock.patch("taskmanager.tasks.UWSGI_TASKMANAGER_EXECUTION_MODE", "fork"):
+            exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task)
+        self.assertNotEqual(report.invocation_result, Report.RESULT_FAILED)
+        self.assertEqual(report.exit_status, 0)
+        self.assertGreater(report.max_rss, 0)
+        self.assertGreater(report.duration, 0)
+        self.assertGreaterEqual(report.cpu_user, 0)
+        self.assertIn("System check identified", report.log)
+
+
+class TestCommandCache(TestCase):
+    """A set of tests for the cache of the command classes."""
+
+    def setUp(self):
+        """Prepare commands, one of them inactive, one missing."""
+        self.command = AppCommand.objects.create(name="check", app_name="django.core")
+        AppCommand.objects.create(name="migrate", app_name="django.core", active=False)
+        AppCommand.objects.create(name="not_a_command", app_name="taskmanager")
+
+    def test_cache(self):
+        """Test each command is a new instance of the cached class."""
+        command = self.command.get_command_class()
+        self.assertIsNot(self.command.get_command_class(), command)
+        self.assertIs(type(command), get_command_class("django.core", "check"))
+        self.assertIs(self.command.help_text, self.command.help_text)
+        self.assertIn("usage:  check", self.command.help_text)
+
+    def test_preload(self):
+        """Test the active commands are preloaded, missing ones are skipped."""
+        get_command_class.cache_clear()
+        self.assertEqual(preload_commands(), 1)
+        self.assertEqual(get_command_class.cache_info().currsize, 1)
+
+
+def sleep_command(*args, **kwargs):
+    """Stand for a command hanging, in short sleeps."""
+    for _ in range(1000):
+        time.sleep(0.01)
+
+
+class TestTimeout(TaskTestCase):
+    """A set of tests for commands running out of time."""
+
+    task_fields = {"timeout": 1}
+
+    def test_watchdog(self):
+        """Test the watchdog interrupts the thread, once expired."""
+        with self.assertRaises(CommandTimeout):
+            with Watchdog(0.1) as watchdog:
+                sleep_command()
+        self.assertTrue(watchdog.expired)
+        with Watchdog(1) as watchdog:
+            pass
+        time.sleep(0.01)
+        self.assertFalse(watchdog.expired)
+
+    def test_watchdog_blocking(self):
+        """Test the watchdog interrupts a blocking call, in the main thread."""
+        started = time.monotonic()
+        with self.assertRaises(CommandTimeout):
+            with Watchdog(0.1):
+                time.sleep(10)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(signal.getsignal(signal.SIGALRM), signal.SIG_DFL)
+
+    def test_watchdog_thread(self):
+        """Test the watchdog interrupts threads other than the main one."""
+        raised = []
+
+        def run():
+            try:
+                with Watchdog(0.1):
+                    sleep_command()
+            except CommandTimeout as e:
+                raised.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(raised), 1)
+
+    def test_watchdog_c_handler(self):
+        """Test a handler of SIGALRM not installed from Python is left as it is."""
+        with mock.patch("signal.getsignal", return_value=None), mock.patch(
+            "signal.signal"
+        ) as set_handler:
+            with self.assertRaises(CommandTimeout):
+                with Watchdog(0.1):
+                    sleep_command()
+        set_handler.assert_not_called()
+
+    def test_forked(self):
+        """Test the child is killed, once timed out."""
+        with mock.patch("taskmanager.execution.call_command", sleep_command):
+            result = run_command_forked("check", [], stdout=StringIO(), timeout=0.1)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.exit_status, -signal.SIGKILL)
+        result = run_command_forked("check", [], stdout=StringIO(), timeout=10)
+        self.assertFalse(result.timed_out)
+
+    def test_forked_process_group(self):
+        """Test the processes started by the child are killed with it, once timed out."""
+
+        def start_sleep(*args, **kwargs):
+            fork_sleep()
+            sleep_command()
+
+        started = time.monotonic()
+        with mock.patch("taskmanager.execution.call_command", start_sleep):
+            result = run_command_forked("check", [], stdout=StringIO(), timeout=0.1)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.exit_status, -signal.SIGKILL)
+
+    def test_exec_command_task(self):
+        """Test a timed out run is reported, and the task is not left running."""
+        with mock.patch("taskmanager.tasks.call_command", sleep_command):
+            exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task)
+        self.assertEqual(report.invocation_result, Report.RESULT_TIMEOUT)
+        self.assertIn("TIMEOUT after 1 seconds", report.log)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertEqual(
+            self.task.cached_last_invocation_result, Report.RESULT_TIMEOUT
+        )
+
+
+class TestResourceUsage(TaskTestCase):
+    """A set of tests for the resources used by the runs."""
+
+    def test_inline(self):
+        """Test the resources used by an inline run are reported, and cached.
+
+        The usage is measured in the spooler process itself: the times and the
+        blocks are the ones used since the command started, the peak memory is
+        the one of the process.
+        """
+        exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task)
+        for field in ("duration", "cpu_user", "cpu_system", "max_rss"):
+            self.assertIsNotNone(getattr(report, field), field)
+        self.assertGreaterEqual(report.io_read_blocks, 0)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.cached_last_invocation_duration, report.duration)
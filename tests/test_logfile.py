@@ -0,0 +1,256 @@
+"""Define taskmanager logfile tests."""
+
+import gzip
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import TestCase
+
+from taskmanager.logfile import (
+    LogReader,
+    ReportLogWriter,
+    compress_logfile,
+    compressed_path,
+    index_path,
+    remove_logfile,
+)
+from taskmanager.models import AppCommand, Task
+
+
+class TestReportLogWriter(TestCase):
+    """A set of tests for the report log writer."""
+
+    def setUp(self):
+        """Prepare a temporary logfile."""
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+
+    def tearDown(self):
+        """Remove the temporary logfile and its index."""
+        remove_logfile(self.path)
+
+    def test_counts_across_chunks(self):
+        """Test lines are accounted whatever the chunks written."""
+        with ReportLogWriter(self.path, n_tail_lines=2) as writer:
+            writer.write("Started\nan ERR")
+            writer.write("OR here\n")
+            writer.write("a WARNING\n\n")
+            writer.write("Finished")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "Started\nan ERROR here\na WARNING\n\nFinished")
+        self.assertEqual(writer.n_lines, 5)
+        self.assertEqual(writer.n_errors, 1)
+        self.assertEqual(writer.n_warnings, 1)
+        self.assertEqual(writer.log_tail, "3 lines hidden ...\n\nFinished")
+
+    def test_index_across_chunks(self):
+        """Test lines written in chunks of many lines are indexed one by one."""
+        with ReportLogWriter(self.path) as writer:
+            writer.write("first àè\nsecond ERROR\nthi")
+            writer.write("rd\nfourth WARNING\nfifth ERROR\n")
+            writer.write("last")
+        lines = ["first àè", "second ERROR", "third", "fourth WARNING", "fifth ERROR", "last"]
+        reader = LogReader(self.path)
+        self.assertEqual(reader.n_indexed_lines, 6)
+        self.assertEqual([reader.lines(n, 1)[0] for n in range(6)], lines)
+        self.assertEqual(reader.level_lines("ERROR"), ["second ERROR", "fifth ERROR"])
+        self.assertEqual(reader.level_lines("WARNING"), ["fourth WARNING"])
+
+    def test_interrupted_write(self):
+        """Test lines are accounted for, even if a write is interrupted."""
+
+        def interrupt(chunk):
+            # e.g. by the timeout of the command, once the chunk is written
+            del writer._account
+            raise KeyboardInterrupt
+
+        with ReportLogWriter(self.path) as writer:
+            writer.write("first\n")
+            writer._account = interrupt
+            with self.assertRaises(KeyboardInterrupt):
+                writer.write("second ERROR\nthi")
+            writer.write("rd\n")
+        reader = LogReader(self.path)
+        self.assertEqual(reader.n_indexed_lines, 3)
+        self.assertEqual(
+            [reader.lines(n, 1)[0] for n in range(3)], ["first", "second ERROR", "third"]
+        )
+        self.assertEqual(reader.level_lines("ERROR"), ["second ERROR"])
+        self.assertEqual((writer.n_lines, writer.n_errors), (3, 1))
+
+    def test_trailing_newline(self):
+        """Test a trailing newline does not count as a line."""
+        with ReportLogWriter(self.path) as writer:
+            writer.write("first\nsecond\n")
+        self.assertEqual(writer.n_lines, 2)
+        self.assertEqual(writer.log_tail, "first\nsecond")
+
+    def test_buffered(self):
+        """Test buffered output is flushed periodically, not at every line."""
+        with ReportLogWriter(self.path, flush_interval=60) as writer:
+            writer.write("first\n")
+            writer.flush()
+            self.assertEqual(os.path.getsize(self.path), 0)
+        self.assertEqual(os.path.getsize(self.path), 6)
+        self.assertEqual(LogReader(self.path).lines(), ["first"])
+
+        with ReportLogWriter(self.path, flush_interval=0.01) as writer:
+            writer.write("first\nsecond\n")
+            deadline = time.monotonic() + 5
+            while not os.path.getsize(self.path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(LogReader(self.path).lines(), ["first", "second"])
+
+    @mock.patch("taskmanager.logfile.INDEX_FLUSH_INTERVAL", 3600)
+    @mock.patch("taskmanager.logfile.INDEX_FLUSH_LINES", 2)
+    def test_index_flushed_periodically(self):
+        """Test the index is flushed every few lines, lagging behind the log."""
+        with ReportLogWriter(self.path) as writer:
+            writer.write("first\n")
+            writer.flush()
+            self.assertEqual(os.path.getsize(self.path), 6)
+            self.assertEqual(os.path.getsize(index_path(self.path)), 0)
+            writer.write("second\nthird\n")
+            self.assertEqual(os.path.getsize(index_path(self.path)), 3 * 8)
+            writer.write("fourth\n")
+            self.assertEqual(os.path.getsize(index_path(self.path)), 3 * 8)
+            self.assertEqual(LogReader(self.path).lines(3), ["fourth"])
+        self.assertEqual(os.path.getsize(index_path(self.path)), 4 * 8)
+
+
+class TestExecCommandTaskLog(TestCase):
+    """A set of tests for the log accounting of executed tasks."""
+
+    def setUp(self):
+        """Prepare a task logging warnings and errors."""
+        self.command, _ = AppCommand.objects.get_or_create(
+            name="test_logging_command", app_name="taskmanager"
+        )
+        self.task = Task.objects.create(
+            name="logging task",
+            command=self.command,
+            arguments="--warning warning_message, --error error_message",
+        )
+
+    def test_report_counts(self):
+        """Test the report fields are filled in from the written log."""
+        self.task.launch()
+        report = self.task.last_report
+        with open(report.logfile) as f:
+            lines = f.read().split("\n")
+        self.assertEqual(report.n_log_lines, len(lines))
+        self.assertEqual(report.n_log_errors, 1)
+        self.assertEqual(report.n_log_warnings, 1)
+        self.assertEqual(report.invocation_result, report.RESULT_ERRORS)
+        self.assertEqual(report.log, "\n".join(lines))
+
+
+class TestLogReader(TestCase):
+    """A set of tests for the log reader."""
+
+    def setUp(self):
+        """Write a logfile with its line index."""
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        with ReportLogWriter(self.path) as writer:
+            for n in range(100):
+                writer.write(f"line {n} àè\n")
+            writer.write("last line")
+        self.reader = LogReader(self.path)
+
+    def tearDown(self):
+        """Remove the temporary logfile and its index."""
+        remove_logfile(self.path)
+
+    def test_index(self):
+        """Test the index holds the offsets at which lines end."""
+        with open(self.path, "rb") as f:
+            offsets = [f.tell() for _ in iter(f.readline, b"")]
+        self.assertEqual(self.reader.n_indexed_lines, 101)
+        self.assertEqual(
+            [self.reader.line_offset(n) for n in range(101)], [0] + offsets[:-1]
+        )
+
+    def test_lines(self):
+        """Test lines are read from any given line."""
+        self.assertEqual(self.reader.count_lines(), 101)
+        self.assertEqual(self.reader.lines(50, 2), ["line 50 àè", "line 51 àè"])
+        self.assertEqual(self.reader.tail(2), ["line 99 àè", "last line"])
+        self.assertEqual(len(self.reader.lines()), 101)
+
+    def test_unindexed_lines(self):
+        """Test lines following the last indexed line are read sequentially."""
+        with open(index_path(self.path), "r+b") as f:
+            f.truncate(90 * 8)
+        self.assertEqual(self.reader.count_lines(), 101)
+        self.assertEqual(self.reader.lines(95, 1), ["line 95 àè"])
+        os.unlink(index_path(self.path))
+        self.assertEqual(self.reader.tail(1), ["last line"])
+
+
+class TestCompressedLogReader(TestCase):
+    """A set of tests for the log reader of compressed logfiles."""
+
+    def setUp(self):
+        """Write a logfile and compress it, in small blocks."""
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        with ReportLogWriter(self.path) as writer:
+            for n in range(1000):
+                writer.write(f"INFO line {n} àè\n")
+            writer.write("last line")
+        self.reader = LogReader(self.path)
+        self.lines = self.reader.lines()
+        self.lines_from_offset = self.reader.read_from(100)
+        compress_logfile(self.path, block_size=1024)
+
+    def tearDown(self):
+        """Remove the temporary logfile and its sidecar files."""
+        remove_logfile(self.path)
+
+    def test_compressed(self):
+        """Test the plain logfile is replaced by a gzip readable file."""
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(self.reader.is_compressed())
+        with gzip.open(compressed_path(self.path)) as f:
+            self.assertEqual(f.read().decode().split("\n"), self.lines)
+
+    def test_lines(self):
+        """Test lines are read from the compressed logfile."""
+        self.assertEqual(self.reader.count_lines(), 1001)
+        self.assertEqual(self.reader.lines(), self.lines)
+        self.assertEqual(self.reader.lines(500, 3), self.lines[500:503])
+        self.assertEqual(self.reader.tail(2), self.lines[-2:])
+        self.assertEqual(self.reader.read_from(100), self.lines_from_offset)
+
+
+class TestLevelIndex(TestCase):
+    """A set of tests for the level indexes."""
+
+    def setUp(self):
+        """Write a logfile with some errors and warnings."""
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        with ReportLogWriter(self.path) as writer:
+            for n in range(100):
+                level = ("ERROR", "WARNING", "INFO")[min(n % 7, 2)]
+                writer.write(f"{level} line {n}\n")
+        self.reader = LogReader(self.path)
+
+    def tearDown(self):
+        """Remove the temporary logfile and its sidecar files."""
+        remove_logfile(self.path)
+
+    def test_level_lines(self):
+        """Test lines at a level are read through the level index."""
+        self.assertTrue(self.reader.has_level_index("ERROR"))
+        self.assertEqual(self.reader.count_level_lines("ERROR"), 15)
+        self.assertEqual(self.reader.count_level_lines("WARNING"), 15)
+        self.assertEqual(
+            self.reader.level_lines("ERROR", 1, 2), ["ERROR line 7", "ERROR line 14"]
+        )
+        self.assertEqual(self.reader.level_lines("WARNING", 14), ["WARNING line 99"])
+        compress_logfile(self.path, block_size=128)
+        self.assertEqual(self.reader.level_lines("ERROR", 14), ["ERROR line 98"])
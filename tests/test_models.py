@@ -1,8 +1,14 @@
 """Define taskmanager models tests."""
 
+import datetime
+from unittest import mock
+
+import pytz
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from taskmanager.models import AppCommand, Report, Task
+from taskmanager.models import AppCommand, Report, Task, TaskCategory
 from taskmanager.settings import UWSGI_TASKMANAGER_N_REPORTS_INLINE
 
 
@@ -104,6 +110,86 @@ class TestTaskModel(TestCase):
         number_of_reports = Report.objects.all().count()
         self.assertEqual(number_of_reports, final_expected_number_of_reports)
 
+    def test_bulk_launch(self):
+        """Test tasks are launched in bulk, each one generating a new Report."""
+        self.assertEqual(Task.objects.all().launch(), 2)
+        self.assertEqual(Report.objects.filter(task=self.task1).count(), 3)
+        self.assertEqual(Report.objects.filter(task=self.task2).count(), 1)
+        self.assertSetEqual(
+            set(Task.objects.values_list("status", flat=True)), {Task.STATUS_IDLE}
+        )
+
+    def test_bulk_launch_keeps_started(self):
+        """Test the state set by a worker while tasks are spooled is not overwritten."""
+
+        def spool_task(task, at=None):
+            # the task is started by a worker as soon as it is spooled
+            Task.objects.filter(pk=task.pk).update(status=Task.STATUS_STARTED)
+            return f"/spool/{task.pk}"
+
+        with mock.patch("taskmanager.models.spool_task", spool_task):
+            self.assertEqual(Task.objects.all().launch(), 2)
+        self.assertSetEqual(
+            set(Task.objects.values_list("status", "spooler_id")),
+            {(Task.STATUS_STARTED, "")},
+        )
+
+    def test_bulk_launch_queries(self):
+        """Test tasks are launched with the same queries, whatever their number."""
+        Task.objects.bulk_create(
+            [Task(name=f"task {n}", command=self.command_check) for n in range(48)]
+        )
+        spool_task = mock.Mock(side_effect=lambda task, at=None: f"/spool/{task.pk}")
+        tasks = list(Task.objects.all())
+        with mock.patch("taskmanager.models.spool_task", spool_task):
+            with CaptureQueriesContext(connection) as one_task:
+                Task.bulk_launch(tasks[:1])
+            with CaptureQueriesContext(connection) as all_tasks:
+                Task.bulk_launch(tasks)
+        self.assertEqual(len(all_tasks), len(one_task))
+        self.assertEqual(
+            dict(Task.objects.values_list("pk", "spooler_id")),
+            {task.pk: f"/spool/{task.pk}" for task in tasks},
+        )
+
+    def test_bulk_stop(self):
+        """Test tasks are stopped in bulk, keeping their last reports only."""
+        for _ in range(UWSGI_TASKMANAGER_N_REPORTS_INLINE):
+            last_report = Report.objects.create(
+                task=self.task1, invocation_result="ok", log=""
+            )
+        Task.objects.update(
+            status=Task.STATUS_SPOOLED,
+            spooler_id="/nonexistent/spooler/file",
+            scheduling=self.report2.invocation_datetime,
+        )
+        self.assertEqual(Task.objects.all().stop(), 2)
+        self.assertSetEqual(
+            set(Task.objects.values_list("status", "spooler_id", "cached_next_ride")),
+            {(Task.STATUS_IDLE, "", None)},
+        )
+        reports = Report.objects.filter(task=self.task1)
+        self.assertEqual(reports.count(), UWSGI_TASKMANAGER_N_REPORTS_INLINE)
+        self.assertEqual(reports.latest("id"), last_report)
+
+    def test_update_next_rides(self):
+        """Test next rides are computed in bulk, from the last reports."""
+        Task.objects.filter(pk=self.task1.pk).update(
+            status=Task.STATUS_SPOOLED,
+            scheduling=self.report2.invocation_datetime,
+            repetition_period=Task.REPETITION_PERIOD_HOUR,
+            repetition_rate=2,
+        )
+        self.task1.refresh_from_db()
+        next_ride = self.task1.get_next_ride()
+        with self.assertNumQueries(2):
+            next_rides = Task.objects.get_next_rides()
+        self.assertEqual(next_rides, {self.task1.pk: next_ride, self.task2.pk: None})
+        with self.assertNumQueries(3):
+            self.assertEqual(Task.objects.update_next_rides(), 1)
+        self.task1.refresh_from_db()
+        self.assertEqual(self.task1.cached_next_ride, next_ride)
+
 
 class TestReportModel(TestCase):
     """A set of tests for reports."""
@@ -150,3 +236,53 @@ class TestReportModel(TestCase):
                 "",
             ],
         )
+        self.assertListEqual(
+            self.report3.get_log_lines(1, 1),
+            ["EXCEPTION raised: min() arg is an empty sequence"],
+        )
+        self.assertListEqual(
+            self.report3.get_log_tail(2),
+            ["Finished: test_command at 2019-01-07 16:49:03.934684", ""],
+        )
+
+
+class TestTaskJitter(TestCase):
+    """A set of tests for the jitter of next rides."""
+
+    def setUp(self):
+        """Prepare a task scheduled on the hour, in a category with jitter."""
+        command, _ = AppCommand.objects.get_or_create(
+            name="test_command", app_name="taskmanager"
+        )
+        self.category = TaskCategory.objects.create(name="imports", jitter=600)
+        self.scheduling = datetime.datetime(2022, 10, 14, 10, tzinfo=pytz.utc)
+        self.task = Task.objects.create(
+            name="hourly task",
+            command=command,
+            category=self.category,
+            status=Task.STATUS_SCHEDULED,
+            scheduling=self.scheduling,
+        )
+
+    def test_offset(self):
+        """Test the offset is stable, within the window of the task or category."""
+        offset = self.task.get_jitter_offset()
+        self.assertLessEqual(offset, datetime.timedelta(seconds=600))
+        self.assertEqual(Task.objects.get(pk=self.task.pk).get_jitter_offset(), offset)
+        self.assertEqual(self.task.get_next_ride(), self.scheduling + offset)
+        self.task.jitter = 0
+        self.assertEqual(self.task.get_next_ride(), self.scheduling)
+
+    def test_no_drift(self):
+        """Test jitter does not accumulate, when rides are repeated."""
+        self.task.status = Task.STATUS_SPOOLED
+        self.task.repetition_period = Task.REPETITION_PERIOD_HOUR
+        offset = self.task.get_jitter_offset()
+        report = Report.objects.create(task=self.task)
+        Report.objects.filter(pk=report.pk).update(
+            invocation_datetime=self.scheduling + offset + datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(
+            self.task.get_next_ride(),
+            self.scheduling + datetime.timedelta(hours=1) + offset,
+        )
@@ -0,0 +1,351 @@
+"""Define taskmanager tasks tests."""
+
+import datetime
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+
+from taskmanager.models import (
+    Report,
+    Task,
+    TaskCategory,
+    parse_shard_values,
+)
+from taskmanager.tasks import (
+    START_CAPPED,
+    START_OK,
+    START_QUEUED,
+    START_SKIPPED,
+    SPOOL_PAYLOAD_VERSION,
+    exec_command_task,
+    spool_task,
+    start_task,
+)
+
+from .base import TaskTestCase
+
+
+class TestConcurrencyLimits(TaskTestCase):
+    """A set of tests for the concurrency caps of categories and commands."""
+
+    task_fields = None
+
+    def setUp(self):
+        """Prepare tasks of a command and of a category, with caps."""
+        super().setUp()
+        self.category = TaskCategory.objects.create(name="imports")
+        self.tasks = [
+            self.create_task(f"task {n}", category=self.category) for n in range(3)
+        ]
+
+    def test_category_cap(self):
+        """Test tasks of a category are started up to the cap."""
+        self.category.max_concurrency = 2
+        self.category.save()
+        self.assertEqual(
+            [start_task(task) for task in self.tasks],
+            [START_OK, START_OK, START_CAPPED],
+        )
+        self.assertEqual(self.tasks[2].status, Task.STATUS_IDLE)
+
+    def test_command_cap(self):
+        """Test tasks of a command are started up to the cap, whatever the category."""
+        self.command.max_concurrency = 1
+        self.command.save()
+        self.tasks[1].category = None
+        self.assertEqual(
+            [start_task(task) for task in self.tasks],
+            [START_OK, START_CAPPED, START_CAPPED],
+        )
+        Task.objects.filter(pk=self.tasks[0].pk).update(status=Task.STATUS_IDLE)
+        self.assertEqual(start_task(self.tasks[1]), START_OK)
+
+    def test_overlapping_cap(self):
+        """Test a running task counts against the cap of its overlapping runs."""
+        self.command.max_concurrency = 1
+        self.command.save()
+        self.assertEqual(
+            [start_task(self.tasks[0]) for _ in range(3)],
+            [START_OK, START_CAPPED, START_CAPPED],
+        )
+
+    def test_respool(self):
+        """Test a task over the cap is spooled again, instead of being executed."""
+        self.category.max_concurrency = 1
+        self.category.save()
+        start_task(self.tasks[0])
+        with mock.patch("taskmanager.tasks.spool_task", return_value="") as spool:
+            exec_command_task(self.tasks[1])
+        self.assertEqual(self.tasks[1].report_set.count(), 0)
+        self.tasks[1].refresh_from_db()
+        self.assertEqual(self.tasks[1].status, Task.STATUS_SPOOLED)
+        self.assertEqual(self.tasks[1].cached_next_ride, spool.call_args.kwargs["at"])
+
+
+class TestOverlapPolicy(TaskTestCase):
+    """A set of tests for runs of tasks starting while still running."""
+
+    task_fields = {"status": Task.STATUS_STARTED}
+
+    def test_allow(self):
+        """Test overlapping runs are started, by default."""
+        self.assertEqual(start_task(self.task), START_OK)
+
+    def test_skip(self):
+        """Test overlapping runs are skipped and counted, without reports."""
+        self.task.overlap_policy = Task.OVERLAP_SKIP
+        self.task.save()
+        exec_command_task(self.task)
+        exec_command_task(self.task)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.n_skipped_runs, 2)
+        self.assertEqual(self.task.report_set.count(), 0)
+        self.assertEqual(self.task.status, Task.STATUS_STARTED)
+
+    def test_queue(self):
+        """Test one overlapping run is queued, the following ones are skipped."""
+        self.task.overlap_policy = Task.OVERLAP_QUEUE
+        self.task.save()
+        self.assertEqual(start_task(self.task), START_QUEUED)
+        self.assertEqual(start_task(self.task), START_SKIPPED)
+        # the running run ends, and the queued one is spooled at once
+        Task.objects.filter(pk=self.task.pk).update(status=Task.STATUS_SPOOLED)
+        with mock.patch("taskmanager.tasks.spool_task", return_value="") as spool:
+            exec_command_task(self.task)
+        spool.assert_called_once_with(self.task, at=None)
+        self.task.refresh_from_db()
+        self.assertFalse(self.task.overlap_queued)
+        self.assertEqual(self.task.n_skipped_runs, 1)
+
+    def test_launch_keeps_status(self):
+        """Test launching a running task does not overwrite its status."""
+        self.task.overlap_policy = Task.OVERLAP_SKIP
+        self.task.save()
+        self.task.launch()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_STARTED)
+        self.assertEqual(self.task.n_skipped_runs, 1)
+
+
+@mock.patch.dict(
+    "taskmanager.models.UWSGI_TASKMANAGER_SPOOLERS",
+    {"fast": "/var/spool/fast", "batch": "/var/spool/batch"},
+)
+class TestSpoolerLanes(TaskTestCase):
+    """A set of tests for the routing of tasks to the spoolers of their lanes."""
+
+    task_fields = None
+
+    def setUp(self):
+        """Prepare a task in a category routed to the batch lane."""
+        super().setUp()
+        self.category = TaskCategory.objects.create(name="imports", lane="batch")
+        self.task = self.create_task(category=self.category)
+
+    def test_get_spooler(self):
+        """Test the lane of the task overrides the one of its category."""
+        self.assertEqual(self.task.get_spooler(), "/var/spool/batch")
+        self.task.lane = "fast"
+        self.assertEqual(self.task.get_spooler(), "/var/spool/fast")
+        self.task.lane = self.category.lane = ""
+        self.assertIsNone(self.task.get_spooler())
+
+    def test_spool(self):
+        """Test the task is spooled in the spooler of its lane."""
+        spooler_file = b"/var/spool/batch/uwsgi_spoolfile_on_host_1"
+        with mock.patch.object(
+            exec_command_task, "spool", return_value=spooler_file
+        ) as spool:
+            self.assertEqual(spool_task(self.task), spooler_file.decode())
+        self.assertEqual(spool.call_args.kwargs["spooler"], b"/var/spool/batch")
+
+    def test_launch_without_uwsgi(self):
+        """Test the lane is ignored when the task is executed synchronously."""
+        self.task.launch()
+        self.assertEqual(self.task.report_set.count(), 1)
+
+
+class TestSpoolPayload(TaskTestCase):
+    """A set of tests for the arguments spooled to execute tasks."""
+
+    def test_spool(self):
+        """Test only the id of the task is spooled, along with the fire time."""
+        at = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        with mock.patch.object(exec_command_task, "spool", return_value=b"") as spool:
+            spool_task(self.task, at=at)
+        self.assertEqual(
+            spool.call_args.args,
+            (self.task.pk, SPOOL_PAYLOAD_VERSION, int(at.timestamp()), None),
+        )
+
+    def test_current_state(self):
+        """Test the task is executed with its state at execution time."""
+        Task.objects.filter(pk=self.task.pk).update(arguments="--deploy")
+        with mock.patch("taskmanager.tasks.call_command") as call:
+            exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, None)
+        command, *args = call.call_args.args
+        self.assertEqual(command.__module__, "django.core.management.commands.check")
+        self.assertEqual(args, ["--deploy"])
+
+    def test_payload_version(self):
+        """Test payloads of earlier versions are executed, later ones dropped."""
+        with mock.patch("taskmanager.tasks.call_command") as call:
+            # version 2, before the shards
+            exec_command_task(self.task.pk, 2, None)
+            call.assert_called_once()
+            with self.assertLogs("taskmanager.tasks", "WARNING"):
+                exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION + 1, None)
+            call.assert_called_once()
+
+    def test_stale_fire_at(self):
+        """Test executions spooled at a time that is not the next ride are dropped."""
+        at = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        fire_at = int(at.timestamp())
+        Task.objects.filter(pk=self.task.pk).update(cached_next_ride=at)
+        with mock.patch("taskmanager.tasks.call_command") as call:
+            exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, fire_at - 60)
+            call.assert_not_called()
+            exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, fire_at)
+            call.assert_called_once()
+        # stopped meanwhile
+        Task.objects.filter(pk=self.task.pk).update(cached_next_ride=None)
+        with mock.patch("taskmanager.tasks.call_command") as call:
+            exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, fire_at)
+        call.assert_not_called()
+
+    def test_reschedule_persisted(self):
+        """Test the next ride is persisted before the task is spooled again.
+
+        A spooler executing the task at once, as when the run lasted longer
+        than the period, does not drop the execution as stale.
+        """
+        Task.objects.filter(pk=self.task.pk).update(
+            scheduling=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc),
+            repetition_period=Task.REPETITION_PERIOD_MINUTE,
+            repetition_rate=1,
+        )
+        spooled = []
+
+        def spool(task, at=None):
+            spooled.append(Task.objects.get(pk=task.pk))
+            return "/var/spool/uwsgi_spoolfile"
+
+        with mock.patch("taskmanager.tasks.spool_task", side_effect=spool) as spool:
+            exec_command_task(self.task.pk)
+        self.assertEqual(spooled[0].status, Task.STATUS_SPOOLED)
+        self.assertEqual(spooled[0].cached_next_ride, spool.call_args.kwargs["at"])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.spooler_id, "/var/spool/uwsgi_spoolfile")
+
+    def test_deleted(self):
+        """Test nothing is executed when the task has been deleted after spooling."""
+        task_id = self.task.pk
+        self.task.delete()
+        with mock.patch("taskmanager.tasks.call_command") as call:
+            exec_command_task(task_id, SPOOL_PAYLOAD_VERSION, None)
+        call.assert_not_called()
+
+
+class TestShards(TaskTestCase):
+    """A set of tests for the runs of sharded tasks."""
+
+    task_fields = {"shard_values": "taskmanager, auth"}
+
+    def test_parse(self):
+        """Test the values of the shards are listed, ranges included."""
+        self.assertEqual(
+            parse_shard_values("a, 08..11,b,"), ["a", "08", "09", "10", "11", "b"]
+        )
+        with self.assertRaises(ValueError):
+            parse_shard_values("3..1")
+
+    def test_max_shards(self):
+        """Test more shards than the max are rejected, without expanding ranges."""
+        self.assertEqual(len(parse_shard_values("a, 1..3", max_shards=4)), 4)
+        with self.assertRaises(ValueError):
+            parse_shard_values("a, 1..3, b", max_shards=4)
+        self.task.shard_values = "1..100000000"
+        with self.assertRaises(ValidationError):
+            self.task.full_clean()
+        # set before the max was lowered
+        Task.objects.filter(pk=self.task.pk).update(shard_values="1..100000000")
+        with self.assertLogs("taskmanager.tasks", "ERROR"):
+            exec_command_task(self.task.pk)
+        self.task.refresh_from_db()
+        self.assertNotEqual(self.task.status, Task.STATUS_STARTED)
+        self.assertEqual(self.task.report_set.count(), 0)
+
+    def test_args(self):
+        """Test the value of a shard is passed to the shard argument, if any."""
+        self.assertEqual(self.task.get_shard_args("auth"), ["auth"])
+        self.task.shard_argument = "--tag"
+        self.assertEqual(self.task.get_shard_args("models"), ["--tag", "models"])
+
+    def test_fan_out(self):
+        """Test a shard is executed for each value, aggregated into the parent."""
+        exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task, parent__isnull=True)
+        shards = list(report.shards.order_by("pk"))
+        self.assertEqual([s.shard_value for s in shards], ["taskmanager", "auth"])
+        self.assertNotIn(Report.RESULT_NO, [s.invocation_result for s in shards])
+        self.assertEqual(report.n_log_lines, sum(s.n_log_lines for s in shards))
+        self.assertEqual(self.task.last_report, report)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertEqual(
+            self.task.cached_last_invocation_result, report.invocation_result
+        )
+
+    def test_last_invocation_datetime(self):
+        """Test the last invocation of a sharded task ignores the reports of shards."""
+        exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task, parent__isnull=True)
+        report.shards.update(
+            invocation_datetime=report.invocation_datetime + datetime.timedelta(hours=1)
+        )
+        task = Task.objects.with_last_invocation_datetime().get(pk=self.task.pk)
+        self.assertEqual(task.last_invocation_datetime, report.invocation_datetime)
+
+    def fan_out(self):
+        """Execute the task, spooling its shards without executing them."""
+        with mock.patch("taskmanager.tasks.spool_task", return_value=""):
+            exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task, parent__isnull=True)
+        return list(report.shards.order_by("pk").values_list("pk", flat=True))
+
+    def test_started_until_complete(self):
+        """Test the task is left started until the last shard completes."""
+        first, last = self.fan_out()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_STARTED)
+        exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, None, first)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_STARTED)
+        exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, None, last)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, Task.STATUS_IDLE)
+        self.assertEqual(self.task.last_report.invocation_result, Report.RESULT_OK)
+
+    def test_capped(self):
+        """Test the running shards are counted by the caps, as running tasks."""
+        first, last = self.fan_out()
+        self.command.max_concurrency = 1
+        self.command.save()
+        self.assertEqual(start_task(self.task, first), START_OK)
+        self.assertEqual(start_task(self.task, first), START_SKIPPED)
+        self.assertEqual(start_task(self.task, last), START_CAPPED)
+        self.assertEqual(start_task(self.create_task("other")), START_CAPPED)
+        with mock.patch("taskmanager.tasks.spool_task", return_value="") as spool:
+            exec_command_task(self.task.pk, SPOOL_PAYLOAD_VERSION, None, last)
+        self.assertEqual(spool.call_args.kwargs["shard_report_id"], last)
+        self.assertFalse(Report.objects.get(pk=last).started)
+        Report.objects.filter(pk=first).update(invocation_result=Report.RESULT_OK)
+        self.assertEqual(start_task(self.task, last), START_OK)
+
+    def test_combined_result(self):
+        """Test the result of a sharded run is the worst one of its shards."""
+        Task.objects.filter(pk=self.task.pk).update(shard_values="auth, not_an_app")
+        exec_command_task(self.task.pk)
+        report = Report.objects.get(task=self.task, parent__isnull=True)
+        self.assertEqual(report.invocation_result, Report.RESULT_FAILED)
+        self.assertIn("not_an_app: failed", report.log)
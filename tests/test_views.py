@@ -0,0 +1,158 @@
+"""Define taskmanager views tests."""
+
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+from django.urls import reverse
+
+from taskmanager.logfile import ReportLogWriter, remove_logfile
+from taskmanager.models import AppCommand, Report, Task
+
+
+class LogViewTestCase(TestCase):
+    """A base test case, with a report having a logfile."""
+
+    def setUp(self):
+        """Prepare a report with a logfile of 100 lines."""
+        fd, self.logfile = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        with ReportLogWriter(self.logfile) as writer:
+            for n in range(100):
+                level = "ERROR" if n % 10 == 0 else "INFO"
+                writer.write(f"{level} line {n}\n")
+        command, _ = AppCommand.objects.get_or_create(
+            name="check", app_name="django.core"
+        )
+        task = Task.objects.create(name="task", command=command)
+        self.report = Report.objects.create(
+            task=task,
+            logfile=self.logfile,
+            n_log_lines=writer.n_lines,
+            n_log_errors=writer.n_errors,
+            n_log_warnings=writer.n_warnings,
+        )
+
+    def tearDown(self):
+        """Remove the logfile."""
+        remove_logfile(self.logfile)
+
+
+class TestLogViewerView(LogViewTestCase):
+    """A set of tests for the log viewer."""
+
+    def get(self, **params):
+        """Get the log viewer of the report."""
+        url = reverse("log_viewer", args=(self.report.pk,))
+        return self.client.get(url, params)
+
+    def test_range(self):
+        """Test a range of lines is shown, with links to other ranges."""
+        response = self.get(start=10, count=5)
+        self.assertEqual(
+            response.context["log_txt"],
+            "ERROR line 10\nINFO line 11\nINFO line 12\nINFO line 13\nINFO line 14",
+        )
+        self.assertEqual(response.context["n_lines"], 100)
+        self.assertEqual(
+            response.context["prev_url"], "?log_level=all&start=5&count=5"
+        )
+        self.assertEqual(
+            response.context["next_url"], "?log_level=all&start=15&count=5"
+        )
+
+    def test_tail(self):
+        """Test the last lines are shown."""
+        response = self.get(tail=2)
+        self.assertEqual(response.context["log_txt"], "INFO line 98\nINFO line 99")
+        self.assertNotIn("next_url", response.context)
+
+    def test_level(self):
+        """Test a range of lines at a given level is shown."""
+        response = self.get(log_level="error", start=8)
+        self.assertEqual(response.context["log_txt"], "ERROR line 80\nERROR line 90")
+        self.assertEqual(response.context["n_lines"], 10)
+
+
+class TestAjaxReadLogLines(LogViewTestCase):
+    """A set of tests for the log lines read by the live log viewer."""
+
+    def get(self, **params):
+        """Get the log lines of the report."""
+        url = reverse("ajax_read_log_lines", args=(self.report.pk,))
+        return self.client.get(url, params).json()
+
+    def test_read(self):
+        """Test all lines are read, with the counters of levels."""
+        data = self.get(offset=0)
+        self.assertEqual(len(data["new_log_lines"]), 100)
+        self.assertEqual(data["n_lines_read"], 100)
+        self.assertEqual(data["level_counts"]["ERROR"], 10)
+        self.assertEqual(data["level_counts"]["INFO"], 90)
+        self.assertEqual(data["log_size"], os.path.getsize(self.logfile))
+        self.assertEqual(self.get(offset=data["log_size"])["new_log_lines"], [])
+
+    def test_chunks(self):
+        """Test lines are read in bounded chunks, up to the end of the log."""
+        lines = []
+        offset = 0
+        eof = False
+        while not eof:
+            data = self.get(offset=offset, max_lines=30)
+            self.assertLessEqual(len(data["new_log_lines"]), 30)
+            lines += data["new_log_lines"]
+            offset, eof = data["log_size"], data["eof"]
+        self.assertEqual(len(lines), 100)
+        data = self.get(max_bytes=25)
+        self.assertEqual(data["new_log_lines"], ["ERROR line 0", "INFO line 1"])
+
+    def test_partial_line(self):
+        """Test a line not yet terminated is read once the report is complete."""
+        with open(self.logfile, "a") as f:
+            f.write("ERROR partial àè")
+        size = os.path.getsize(self.logfile)
+        data = self.get(line=100)
+        self.assertEqual(data["new_log_lines"], [])
+        self.assertTrue(data["eof"])
+        self.report.invocation_result = Report.RESULT_ERRORS
+        self.report.save()
+        data = self.get(line=100)
+        self.assertEqual(data["new_log_lines"], ["ERROR partial àè"])
+        self.assertEqual(data["log_size"], size)
+
+    def test_level(self):
+        """Test lines are filtered by level, while all levels are counted."""
+        data = self.get(level="error", line=85)
+        self.assertEqual(data["new_log_lines"], ["ERROR line 90"])
+        self.assertEqual(data["n_lines_read"], 15)
+        self.assertEqual(data["level_counts"]["INFO"], 14)
+
+    def test_grep(self):
+        """Test lines are filtered by alternative terms."""
+        data = self.get(grep="line 42|line 7")
+        self.assertEqual(
+            data["new_log_lines"],
+            ["INFO line 7", "INFO line 42", "ERROR line 70"]
+            + [f"INFO line {n}" for n in range(71, 80)],
+        )
+        data = self.get(grep="line 42|line 7", level="error")
+        self.assertEqual(data["new_log_lines"], ["ERROR line 70"])
+
+
+class TestStreamLogLines(LogViewTestCase):
+    """A set of tests for the log lines streamed to the live log viewer."""
+
+    def test_complete_report(self):
+        """Test the lines of a complete report are streamed, then the stream ends."""
+        self.report.invocation_result = Report.RESULT_ERRORS
+        self.report.save()
+        url = reverse("stream_log_lines", args=(self.report.pk,))
+        response = self.client.get(url, HTTP_LAST_EVENT_ID="0")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = b"".join(response.streaming_content).decode().split("\n\n")
+        self.assertEqual(events[0], "retry: 3000")
+        event_id, data = events[1].split("\n")
+        self.assertEqual(event_id, f"id: {os.path.getsize(self.logfile)}")
+        self.assertEqual(len(json.loads(data[len("data: "):])["new_log_lines"]), 100)
+        self.assertTrue(events[2].startswith("event: end\n"))